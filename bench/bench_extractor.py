@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from extractor import find_hydration_json, orjson
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# The regex path parse_html_for_data used before the byte-scanning extractor
+LEGACY_PATTERNS = [
+    r'<script id="SIGI_STATE" type="application/json">(.*?)</script>',
+    r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>',
+    r'window\[\'SIGI_STATE\'\]\s*=\s*({.*?});',
+    r'window\.__UNIVERSAL_DATA_FOR_REHYDRATION__\s*=\s*({.*?});'
+]
+
+def legacy_extract(body):
+    html_content = body.decode('utf-8', errors='ignore')
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, html_content, re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group(1))
+            except json.JSONDecodeError:
+                continue
+    return None
+
+def load_fixture(path, size_mb):
+    """
+    Pads a saved page to roughly size_mb with inline JS before the hydration script,
+    which is where the bulk of a real product page sits.
+    """
+    with open(path, "rb") as f:
+        body = f.read()
+    filler_len = int(size_mb * 1024 * 1024) - len(body)
+    if filler_len <= 0:
+        return body
+    chunk = b'function a(e,t){return e&&t?{x:e.x+t.x,"y":[1,2,3]}:null};var n=window.__x||{};\n'
+    filler = b"<script>" + chunk * (filler_len // len(chunk)) + b"</script>\n"
+    insert_at = body.index(b"<div id=\"app\">")
+    return body[:insert_at] + filler + body[insert_at:]
+
+def bench(func, body, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(body)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark: regex vs single-pass hydration extractor.")
+    parser.add_argument("--size-mb", type=float, default=3.0, help="Pad each fixture to this size")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"JSON backend: {'orjson' if orjson else 'json'}")
+    print(f"{'fixture':<32} {'size':>8} {'regex ms':>10} {'bytes ms':>10} {'speedup':>8}")
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith(".html"):
+            continue
+        body = load_fixture(os.path.join(FIXTURES_DIR, name), args.size_mb)
+
+        expected = legacy_extract(body)
+        actual, _ = find_hydration_json(body)
+        if expected is not None and actual != expected:
+            print(f"MISMATCH: {name} decoded differently")
+
+        legacy_time = bench(legacy_extract, body, args.repeat)
+        new_time = bench(find_hydration_json, body, args.repeat)
+        print(f"{name:<32} {len(body) / 1048576:>6.2f}MB {legacy_time * 1000:>10.2f} "
+              f"{new_time * 1000:>10.2f} {legacy_time / new_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+# Keep the benchmark's own I/O out of the measurement
+os.environ.setdefault("RAW_ARCHIVE_MODE", "off")
+os.environ.setdefault("METRICS_FILE", "")
+
+import fakes  # noqa: E402
+import monitor  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from output import LocalDataset  # noqa: E402
+from parsing import ParsePool  # noqa: E402
+from sessions import SessionPool  # noqa: E402
+from signer import SignerClient, SignerPool  # noqa: E402
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def product_urls(base_url, products, api_share):
+    """`products` distinct URLs; every 1/api_share-th one hits the JSON API fixture."""
+    every = round(1 / api_share) if api_share else 0
+    return [f"{base_url}/api/product/{i}" if every and i % every == 0 else f"{base_url}/product/{i}"
+            for i in range(products)]
+
+
+def start_fakes(args):
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    process = ctx.Process(target=fakes.serve, args=(args.port, args.latency, args.error_rate, args.sign_latency, ready),
+                          daemon=True)
+    process.start()
+    if not ready.wait(10):
+        raise RuntimeError("fake servers did not start")
+    return process
+
+
+async def run_async(urls, args, signer_url):
+    sessions = SessionPool(max_clients=args.concurrency)
+    pool = SignerPool([signer_url], sessions, probe_interval=0)
+    signer = SignerClient(pool, sessions)
+    parser = ParsePool(args.parse_workers)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    ok = 0
+
+    async def one(url):
+        nonlocal ok
+        async with semaphore:
+            start = time.perf_counter()
+            result = await monitor.fetch_product_data_async(url, sessions, signer, parser)
+            latencies.append(time.perf_counter() - start)
+            ok += result is not None
+
+    try:
+        await asyncio.gather(*(one(urls[i % len(urls)]) for i in range(args.requests)))
+    finally:
+        await sessions.close()
+        parser.close()
+    return latencies, ok
+
+
+def run_sync(urls, args, signer_url):
+    monitor.SIGNATURE_SERVICE_URL = signer_url
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        result = monitor.fetch_product_data(urls[i % len(urls)])
+        latencies.append(time.perf_counter() - start)
+        return result is not None
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        ok = sum(executor.map(one, range(args.requests)))
+    return latencies, ok
+
+
+async def run_fleet(urls, args, signer_url):
+    dataset = LocalDataset()
+    cwd = os.getcwd()
+    # Store, aggregates and checkpoints land in a scratch directory
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            await monitor.monitor_fleet(
+                urls, duration_days=args.duration / 86400, interval_hours=args.interval / 3600,
+                max_concurrency=args.concurrency, host_rate=0, signer_urls=[signer_url],
+                dataset=dataset, parse_workers=args.parse_workers,
+            )
+        finally:
+            os.chdir(cwd)
+    return len(dataset.items)
+
+
+def report(label, elapsed, requests, ok, latencies):
+    print(f"mode:        {label}")
+    print(f"requests:    {requests} ({ok} ok, {requests - ok} failed)")
+    print(f"elapsed:     {elapsed:.2f}s")
+    print(f"throughput:  {requests / elapsed:.1f} req/s")
+    if latencies:
+        print("latency:     " + "  ".join(f"p{int(q * 100)}={percentile(latencies, q) * 1000:.1f}ms"
+                                         for q in (0.50, 0.95, 0.99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark: fake signer + fake product host.")
+    parser.add_argument("--mode", choices=("async", "sync", "fleet"), default="async",
+                        help="async: fetch_product_data_async; sync: fetch_product_data on threads; "
+                             "fleet: monitor_fleet for --duration seconds")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=None, help="Distinct product URLs (default: --requests)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--api-share", type=float, default=0.2, help="Fraction of products served as JSON API")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean fake product latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--sign-latency", type=float, default=0.0)
+    parser.add_argument("--parse-workers", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=10.0, help="fleet mode: run time (s)")
+    parser.add_argument("--interval", type=float, default=1.0, help="fleet mode: per-product interval (s)")
+    parser.add_argument("--port", type=int, default=18900)
+    parser.add_argument("--tracemalloc", action="store_true", help="Report peak Python heap (slows the run)")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    process = start_fakes(args)
+    base_url = f"http://127.0.0.1:{args.port}"
+    signer_url = f"{base_url}/signature"
+    urls = product_urls(base_url, args.products or args.requests, args.api_share)
+    METRICS.reset()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    try:
+        if args.mode == "async":
+            latencies, ok = asyncio.run(run_async(urls, args, signer_url))
+            requests = args.requests
+        elif args.mode == "sync":
+            latencies, ok = run_sync(urls, args, signer_url)
+            requests = args.requests
+        else:
+            ok = asyncio.run(run_fleet(urls, args, signer_url))
+            # One record per successful poll; the fetch histogram counts every poll
+            latencies, requests = [], METRICS.snapshot()["stages"].get("fetch", {}).get("count", ok)
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+
+    report(args.mode, elapsed, requests, ok, latencies)
+    print(f"peak RSS:    {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB")
+    if args.tracemalloc:
+        print(f"peak heap:   {tracemalloc.get_traced_memory()[1] / 1048576:.1f}MB")
+    stages = METRICS.snapshot()["stages"]
+    for stage, row in stages.items():
+        print(f"  {stage:<8} n={row['count']:<6} mean={row['mean'] * 1000:8.2f}ms  p95<={row['p95'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
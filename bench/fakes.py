@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+SIGNATURE = {"X-Bogus": "DFSzswVLbench", "X-Gnarly": "bench"}
+IDENTITY = {"cookies": "msToken=bench; ttwid=bench", "navigator": {"user_agent": "Mozilla/5.0 (bench)"}}
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Recorded responses by kind: {"html": [bytes, ...], "json": [bytes, ...]}."""
+    fixtures = {"html": [], "json": []}
+    for name in sorted(os.listdir(directory)):
+        kind = name.rsplit(".", 1)[-1]
+        if kind in fixtures:
+            with open(os.path.join(directory, name), "rb") as f:
+                fixtures[kind].append(f.read())
+    return fixtures
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for both the Node.js signature service and TikTok:
+
+    - POST /signature and /signature/batch answer like index.js.
+    - GET /health reports a working signer.
+    - GET /api/... serves a JSON fixture; any other GET an HTML fixture, picked by
+      the trailing product id so a product always gets the same page.
+    Product responses wait `latency` seconds (+/- 50% jitter) and fail with 503 at `error_rate`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body, content_type="application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        if server.sign_latency:
+            time.sleep(server.sign_latency)
+        if self.path.endswith("/batch"):
+            data = {"signatures": [SIGNATURE for _ in payload.get("urls", [])]}
+            if payload.get("identity"):
+                data.update(IDENTITY)
+        else:
+            data = dict(IDENTITY, signed_url=SIGNATURE)
+        self._send(200, json.dumps({"status": "ok", "data": data}).encode())
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/health":
+            return self._send(200, b'{"status": "ok", "signer": true}')
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if server.error_rate and random.random() < server.error_rate:
+            return self._send(503, b"Service Unavailable", "text/plain")
+
+        path = self.path.split("?", 1)[0]
+        digits = "".join(c for c in path.rsplit("/", 1)[-1] if c.isdigit())
+        index = int(digits) if digits else 0
+        if path.startswith("/api/") and server.fixtures["json"]:
+            body, content_type = server.fixtures["json"][index % len(server.fixtures["json"])], "application/json"
+        else:
+            body, content_type = server.fixtures["html"][index % len(server.fixtures["html"])], "text/html; charset=utf-8"
+        self._send(200, body, content_type)
+
+
+def make_server(port=0, latency=0.0, error_rate=0.0, sign_latency=0.0, fixtures=None, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), FakeHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.latency = latency
+    server.error_rate = error_rate
+    server.sign_latency = sign_latency
+    server.fixtures = fixtures or load_fixtures()
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Starts a fake server on a background thread; returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def serve(port, latency=0.0, error_rate=0.0, sign_latency=0.0, ready=None):
+    """Process entry point: serves until killed. `ready` (an Event) is set once listening."""
+    server = make_server(port, latency, error_rate, sign_latency)
+    if ready is not None:
+        ready.set()
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake signature service + product host for offline benchmarks.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean product response latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of product requests answered with 503")
+    parser.add_argument("--sign-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    print(f"Fake signer/product host on http://127.0.0.1:{args.port} (signer: /signature, products: /product/<id>)")
+    serve(args.port, args.latency, args.error_rate, args.sign_latency)
+
+
+if __name__ == "__main__":
+    main()
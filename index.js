@@ -9,7 +9,7 @@ puppeteer.use(StealthPlugin());
 const app = express();
 app.use(express.json());
 
-const PORT = 8081;
+const PORT = parseInt(process.env.PORT, 10) || 8081;
 let browser;
 let page;
 
@@ -36,15 +36,20 @@ async function initBrowser() {
 
     console.log('Navigating to TikTok to load signing scripts...');
     // We need to visit a page that loads the signer. The main page usually works.
+    // Only byted_acrawler matters, so stop waiting as soon as it is defined instead of
+    // waiting for the network to go idle (/health reports ready from that moment).
+    const started = Date.now();
     await page.goto('https://www.tiktok.com/?is_from_webapp=1&sender_device=pc', {
-        waitUntil: 'networkidle2',
+        waitUntil: 'domcontentloaded',
         timeout: 60000
     });
 
     // Check if signer is available
-    const signerAvailable = await page.evaluate(() => {
-        return typeof window.byted_acrawler !== 'undefined';
-    });
+    const signerAvailable = await page.waitForFunction(
+        () => typeof window.byted_acrawler !== 'undefined',
+        { timeout: 60000 }
+    ).then(() => true, () => false);
+    console.log(`Signer check finished ${Date.now() - started}ms after navigation started.`);
 
     if (signerAvailable) {
         console.log('Signer (byted_acrawler) found!');
@@ -131,6 +136,74 @@ app.post('/signature', async (req, res) => {
     }
 });
 
+// Health probe for the Python signer pool: reports whether byted_acrawler is still present.
+app.get('/health', async (req, res) => {
+    let signer = false;
+    try {
+        if (page) {
+            signer = await page.evaluate(() => typeof window.byted_acrawler !== 'undefined');
+        }
+    } catch (error) {
+        console.error('Health check failed:', error);
+    }
+    res.status(signer ? 200 : 503).json({ status: signer ? 'ok' : 'error', signer });
+});
+
+// Batch signing: one page.evaluate for all URLs, cookies/UA only when the caller asks for them.
+app.post('/signature/batch', async (req, res) => {
+    const { urls, identity = true } = req.body;
+    if (!Array.isArray(urls) || urls.length === 0) {
+        return res.status(400).json({ status: 'error', message: 'urls must be a non-empty array' });
+    }
+
+    try {
+        if (!page) {
+             await initBrowser();
+        }
+
+        const result = await page.evaluate((targetUrls) => {
+            if (typeof window.byted_acrawler === 'undefined') return null;
+
+            const signatures = targetUrls.map((targetUrl) => {
+                try {
+                    if (typeof window.byted_acrawler.frontierSign === 'function') {
+                        return window.byted_acrawler.frontierSign({
+                            "X-Bogus": true
+                        }, {
+                             url: targetUrl
+                        });
+                    }
+                    return { error: "No signing function found" };
+                } catch (e) {
+                     try {
+                        return window.byted_acrawler.frontierSign(targetUrl);
+                    } catch (e2) {
+                         return { error: e.toString() + " | " + e2.toString() };
+                    }
+                }
+            });
+            return { signatures, userAgent: navigator.userAgent };
+        }, urls);
+
+        if (!result) {
+             return res.status(500).json({ status: 'error', message: 'Signer not available or failed' });
+        }
+
+        const data = { signatures: result.signatures };
+        if (identity) {
+            const cookies = await page.cookies();
+            data.cookies = cookies.map(c => `${c.name}=${c.value}`).join('; ');
+            data.navigator = { user_agent: result.userAgent };
+        }
+
+        res.json({ status: 'ok', data });
+
+    } catch (error) {
+        console.error('Error batch signing:', error);
+        res.status(500).json({ status: 'error', message: error.toString() });
+    }
+});
+
 app.listen(PORT, async () => {
     console.log(`Signature service running on port ${PORT}`);
     await initBrowser();
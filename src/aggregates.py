@@ -0,0 +1,206 @@
+import argparse
+import json
+import logging
+import math
+import os
+from collections import deque
+
+from store import to_epoch, to_number
+
+
+class ProductAggregate:
+    """
+    Running aggregates for one product, updated in O(1) per sample.
+
+    Keeps the last sample, cumulative sold delta and revenue since monitoring
+    started, an EWMA of sales velocity (units/hour) and a bounded deque of
+    hourly buckets [bucket_start, sold, revenue].
+    """
+
+    __slots__ = ("product_id", "first_ts", "last_ts", "last_sold", "last_stock", "last_price",
+                 "cumulative_sold", "cumulative_revenue", "velocity", "samples", "hourly")
+
+    def __init__(self, product_id, max_hours=168):
+        self.product_id = product_id
+        self.first_ts = None
+        self.last_ts = None
+        self.last_sold = None
+        self.last_stock = None
+        self.last_price = None
+        self.cumulative_sold = 0.0
+        self.cumulative_revenue = 0.0
+        self.velocity = None
+        self.samples = 0
+        self.hourly = deque(maxlen=max_hours)
+
+    def update(self, ts, sold, stock, price, halflife_hours):
+        self.samples += 1
+        if self.first_ts is None:
+            self.first_ts = ts
+
+        if self.last_ts is not None and sold is not None and self.last_sold is not None and ts > self.last_ts:
+            delta = sold - self.last_sold
+            if delta < 0:
+                # Counter reset: the new value counts as sold since the reset
+                delta = sold
+            unit_price = price if price is not None else self.last_price
+            revenue = delta * unit_price if unit_price is not None else 0.0
+            self.cumulative_sold += delta
+            self.cumulative_revenue += revenue
+
+            hours = (ts - self.last_ts) / 3600.0
+            rate = delta / hours
+            if self.velocity is None:
+                self.velocity = rate
+            else:
+                # Time-aware EWMA: irregular sampling still decays by elapsed time
+                alpha = 1.0 - math.exp(-hours * math.log(2) / halflife_hours)
+                self.velocity += alpha * (rate - self.velocity)
+
+            bucket = ts - ts % 3600
+            if self.hourly and self.hourly[-1][0] == bucket:
+                self.hourly[-1][1] += delta
+                self.hourly[-1][2] += revenue
+            else:
+                self.hourly.append([bucket, delta, revenue])
+
+        if ts >= (self.last_ts or 0):
+            self.last_ts = ts
+            if sold is not None:
+                self.last_sold = sold
+            if stock is not None:
+                self.last_stock = stock
+            if price is not None:
+                self.last_price = price
+
+    def sold_since(self, since_ts):
+        # Bounded by maxlen, so still constant time per product
+        return sum(sold for bucket, sold, _ in self.hourly if bucket >= since_ts)
+
+    def to_dict(self):
+        return {slot: ([list(b) for b in self.hourly] if slot == "hourly" else getattr(self, slot))
+                for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data, max_hours=168):
+        agg = cls(data["product_id"], max_hours)
+        for slot in cls.__slots__:
+            if slot == "hourly":
+                agg.hourly.extend(data.get("hourly", []))
+            elif slot in data:
+                setattr(agg, slot, data[slot])
+        return agg
+
+
+class AggregateBook:
+    """
+    Per-product running aggregates, maintained as samples are recorded so report
+    queries do not rescan history. `checkpoint()` compacts the book to a JSON
+    file (written atomically); `load()` resumes from it.
+
+    Snapshots are incremental: the plain-data copy of each product is cached and
+    only products updated since the previous snapshot are copied again.
+    """
+
+    def __init__(self, path="aggregates.json", halflife_hours=6.0, max_hours=168):
+        self.path = path
+        self.halflife_hours = halflife_hours
+        self.max_hours = max_hours
+        self.products = {}
+        self._copies = {}
+        self._changed = set()
+
+    @classmethod
+    def load(cls, path="aggregates.json", **kwargs):
+        book = cls(path, **kwargs)
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                for item in data.get("products", []):
+                    agg = book.products[item["product_id"]] = ProductAggregate.from_dict(item, book.max_hours)
+                    book._copies[agg.product_id] = agg.to_dict()
+                logging.info(f"Loaded aggregates for {len(book.products)} products from {path}.")
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Could not load aggregates from {path}: {e}")
+        return book
+
+    def update(self, sample):
+        product_id = str(sample.get("product_id") or "unknown")
+        agg = self.products.get(product_id)
+        if agg is None:
+            agg = self.products[product_id] = ProductAggregate(product_id, self.max_hours)
+        agg.update(
+            to_epoch(sample["timestamp"]),
+            to_number(sample.get("total_sold")),
+            to_number(sample.get("total_stock")),
+            to_number(sample.get("price")),
+            self.halflife_hours,
+        )
+        self._changed.add(product_id)
+        return agg
+
+    @property
+    def dirty(self):
+        """True when products changed since the last snapshot."""
+        return bool(self._changed)
+
+    def report(self, product_id, now=None):
+        """O(1) report row for one product, or None if it has no samples."""
+        agg = self.products.get(str(product_id))
+        if agg is None:
+            return None
+        now = now if now is not None else agg.last_ts
+        return {
+            "product_id": agg.product_id,
+            "samples": agg.samples,
+            "first_ts": agg.first_ts,
+            "last_ts": agg.last_ts,
+            "total_sold": agg.last_sold,
+            "total_stock": agg.last_stock,
+            "price": agg.last_price,
+            "sold_since_start": agg.cumulative_sold,
+            "revenue_since_start": agg.cumulative_revenue,
+            "sold_last_24h": agg.sold_since(now - 86400),
+            "sales_velocity_per_hour": agg.velocity,
+        }
+
+    def snapshot(self):
+        """
+        The aggregates as plain data. Only products changed since the last snapshot
+        are copied, so it stays cheap on the event loop; the result shares no
+        mutable state with the book and can be written from another thread.
+        """
+        for product_id in self._changed:
+            self._copies[product_id] = self.products[product_id].to_dict()
+        self._changed.clear()
+        return {"halflife_hours": self.halflife_hours, "products": list(self._copies.values())}
+
+    def write(self, data):
+        """Writes a snapshot to `path` (tmp file + rename); safe to run in a worker thread."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def checkpoint(self):
+        """Snapshot + write. Skipped when nothing changed since the last checkpoint."""
+        if not self.dirty:
+            return False
+        self.write(self.snapshot())
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print running aggregates from a checkpoint.")
+    parser.add_argument("product_ids", nargs="*", help="Products to report (default: all)")
+    parser.add_argument("--path", default="aggregates.json")
+    args = parser.parse_args()
+
+    book = AggregateBook.load(args.path)
+    for product_id in args.product_ids or list(book.products):
+        print(json.dumps(book.report(product_id)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+from products import parse_product_url
+
+# zstd is optional; gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_MODES = ("off", "sampled", "failures", "all")
+INDEX_FILE = "index.jsonl"
+
+
+class ResponseArchive:
+    """
+    Compressed archive of raw fetch responses for debugging and replay.
+
+    Modes: "off", "sampled" (a `sample_rate` fraction of responses plus every
+    extraction failure), "failures" (only responses that yielded no data) and "all".
+    `record()` only enqueues; a background thread compresses each body as its own
+    zstd/gzip frame, appends it to the current segment file and writes an index
+    line (product_id, timestamp, segment, offset, length) to `index.jsonl`.
+    Segments rotate once they reach `segment_bytes`. When the queue is full new
+    records are dropped rather than slowing down polling.
+    """
+
+    def __init__(self, directory="raw_archive", mode="failures", sample_rate=0.01,
+                 segment_bytes=64 * 1024 * 1024, compression=None, max_queue=256):
+        if mode not in ARCHIVE_MODES:
+            raise ValueError(f"Unknown archive mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.segment_bytes = segment_bytes
+        if compression is None:
+            compression = "zstd" if zstandard else "gzip"
+        if compression == "zstd" and zstandard is None:
+            logging.warning("zstandard is not installed; archiving with gzip.")
+            compression = "gzip"
+        self.compression = compression
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._segment = None
+        self._segment_name = None
+        self._segment_size = 0
+        self._segment_count = 0
+        self._compressor = zstandard.ZstdCompressor(level=3) if compression == "zstd" else None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.environ.get("RAW_ARCHIVE_DIR", "raw_archive"),
+            mode=os.environ.get("RAW_ARCHIVE_MODE", "failures"),
+            sample_rate=float(os.environ.get("RAW_ARCHIVE_SAMPLE_RATE", "0.01")),
+        )
+
+    def should_record(self, extracted):
+        if self.mode == "off":
+            return False
+        if self.mode == "all" or not extracted:
+            return True
+        return self.mode == "sampled" and random.random() < self.sample_rate
+
+    def record(self, url, content, content_type="", status_code=None, result=None, product_id=None):
+        """
+        Queues one raw response for archiving if the mode selects it. Never blocks.
+        Without `product_id` the id comes from the result, else from the URL, so
+        failed extractions are still found by product.
+        """
+        if not self.should_record(result is not None):
+            return
+        if product_id is None and result:
+            product_id = result.get("product_id")
+        if product_id is None:
+            key = parse_product_url(url)
+            product_id = key.product_id if key is not None else None
+        meta = {
+            # A sample's own timestamp, so replayed samples line up with the stored row
+            "timestamp": (result or {}).get("timestamp") or datetime.now().isoformat(),
+            "product_id": product_id or "unknown",
+            "url": url,
+            "status_code": status_code,
+            "content_type": content_type,
+            "extracted": result is not None,
+        }
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((meta, content))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="response-archive", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _compress(self, content):
+        if self.compression == "zstd":
+            return self._compressor.compress(content)
+        return gzip.compress(content, compresslevel=6)
+
+    def _open_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+        suffix = "zst" if self.compression == "zstd" else "gz"
+        self._segment_count += 1
+        self._segment_name = f"segment-{int(time.time())}-{self._segment_count:04d}.{suffix}"
+        self._segment = open(os.path.join(self.directory, self._segment_name), "ab")
+        self._segment_size = self._segment.tell()
+
+    def _run(self):
+        index = open(os.path.join(self.directory, INDEX_FILE), "a")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                # Drain whatever else is waiting so the index is flushed once per batch
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(item)
+                lines = []
+                for meta, content in batch:
+                    try:
+                        lines.append(self._write(meta, content))
+                    except Exception as e:
+                        logging.error(f"Failed to archive response for {meta.get('url')}: {e}")
+                # Frames reach the segment file before the index lines that point at them
+                if self._segment is not None:
+                    self._segment.flush()
+                index.write("".join(lines))
+                index.flush()
+        finally:
+            index.close()
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def _write(self, meta, content):
+        """Appends content's frame to the segment; returns its index line."""
+        if self._segment is None or self._segment_size >= self.segment_bytes:
+            self._open_segment()
+        frame = self._compress(content)
+        offset = self._segment_size
+        self._segment.write(frame)
+        self._segment_size += len(frame)
+        meta = dict(meta, segment=self._segment_name, offset=offset, length=len(frame),
+                    raw_length=len(content), compression=self.compression)
+        self.written += 1
+        return json.dumps(meta) + "\n"
+
+    def close(self):
+        """Flushes queued records and stops the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self.dropped:
+            logging.warning(f"Response archive dropped {self.dropped} records (queue full).")
+
+
+def decompress(frame, compression):
+    """Decompresses one archived frame."""
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd archive segments")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    return gzip.decompress(frame)
+
+
+def iter_index(directory, product_id=None, since=None, until=None, failures_only=False):
+    """
+    Yields index entries, optionally filtered by product_id and ISO timestamp range.
+    """
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if product_id is not None and entry.get("product_id") != product_id:
+                continue
+            if since is not None and entry["timestamp"] < since:
+                continue
+            if until is not None and entry["timestamp"] >= until:
+                continue
+            if failures_only and entry.get("extracted"):
+                continue
+            yield entry
+
+
+def read_record(directory, entry):
+    """Reads and decompresses the raw body for one index entry."""
+    with open(os.path.join(directory, entry["segment"]), "rb") as f:
+        f.seek(entry["offset"])
+        frame = f.read(entry["length"])
+    return decompress(frame, entry.get("compression", "gzip"))
+
+
+def iter_records(directory, **filters):
+    """Yields (index entry, raw body) pairs; accepts the same filters as iter_index."""
+    for entry in iter_index(directory, **filters):
+        try:
+            yield entry, read_record(directory, entry)
+        except Exception as e:
+            logging.error(f"Failed to read archived response {entry.get('segment')}@{entry.get('offset')}: {e}")
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from contextlib import aclosing
+from urllib.parse import quote
+
+from extractor import JSON_ERRORS, find_hydration_json, loads
+
+Listing = namedtuple("Listing", ["product_ids", "has_more", "next_cursor", "total"])
+
+# Keys that hold the product list / paging fields in listing responses, in lookup order
+_LIST_KEYS = ("products", "product_list", "productList", "items", "item_list", "itemList")
+_ID_KEYS = ("product_id", "productId", "item_id", "id")
+_CURSOR_KEYS = ("next_cursor", "nextCursor", "cursor", "offset")
+_HAS_MORE_KEYS = ("has_more", "hasMore", "has_next")
+_TOTAL_KEYS = ("total", "total_count", "totalCount", "product_count")
+
+
+def _first(mapping, keys):
+    return next((mapping[k] for k in keys if mapping.get(k) is not None), None)
+
+
+def _find_listing(node, depth=0):
+    """Depth-first search for the dict holding a list of products (dicts with an id)."""
+    if depth > 8:
+        return None, None
+    if isinstance(node, dict):
+        for key in _LIST_KEYS:
+            items = node.get(key)
+            if isinstance(items, list) and items and isinstance(items[0], dict) and _first(items[0], _ID_KEYS):
+                return node, items
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None, None
+    for child in children:
+        if isinstance(child, (dict, list)):
+            holder, items = _find_listing(child, depth + 1)
+            if items is not None:
+                return holder, items
+    return None, None
+
+
+def parse_listing(content, content_type=""):
+    """
+    Product ids and paging fields from one shop listing response (JSON API or an
+    HTML page with hydration JSON). Returns a Listing, or None when the body holds
+    no recognizable product list.
+    """
+    try:
+        if "html" in content_type:
+            data, _ = find_hydration_json(content)
+        else:
+            data = loads(content)
+    except JSON_ERRORS:
+        return None
+    holder, items = _find_listing(data)
+    if items is None:
+        return None
+    product_ids = [str(_first(item, _ID_KEYS)) for item in items if _first(item, _ID_KEYS)]
+    # Paging fields sit next to the list or one level up (data.has_more, data.products)
+    paging = dict(data) if isinstance(data, dict) else {}
+    if isinstance(paging.get("data"), dict):
+        paging.update(paging["data"])
+    paging.update(holder)
+    has_more = bool(_first(paging, _HAS_MORE_KEYS))
+    return Listing(product_ids, has_more, _first(paging, _CURSOR_KEYS), _first(paging, _TOTAL_KEYS))
+
+
+class ShopCatalog:
+    """
+    Known product ids of one shop, kept in sync with its paginated listing.
+
+    `page_url` is a template with {shop}, {cursor} and {count}. Pages are fetched
+    through an async `fetch(url)` returning (content, content_type) or None. While
+    one page is parsed the next is already being signed and fetched, on the guess
+    that the cursor is a numeric offset; a response that disagrees cancels the guess,
+    and opaque cursors turn guessing off.
+    """
+
+    def __init__(self, shop, page_url, page_size=30, max_pages=200):
+        self.shop = shop
+        self.page_url = page_url
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.product_ids = set()
+        self.total = None
+        self.refreshed_at = None
+        self.pages_fetched = 0
+        self.prefetch_hits = 0
+        self._speculate = True
+
+    def url_for(self, cursor):
+        return self.page_url.format(shop=quote(str(self.shop)), cursor=quote(str(cursor)), count=self.page_size)
+
+    def _guess_next(self, cursor):
+        if self._speculate and isinstance(cursor, int):
+            return cursor + self.page_size
+        return None
+
+    async def pages(self, fetch):
+        """
+        Yields (cursor, Listing) page by page, ending early when a page fails (the last
+        item is then (cursor, None)) or max_pages is reached.
+        """
+        cursor = 0
+        pending = asyncio.create_task(fetch(self.url_for(cursor)))
+        prefetched = None
+        try:
+            for _ in range(self.max_pages):
+                body = await pending
+                pending = None
+                self.pages_fetched += 1
+                if body is None:
+                    yield cursor, None
+                    return
+
+                guess = self._guess_next(cursor)
+                if guess is not None:
+                    prefetched = guess
+                    pending = asyncio.create_task(fetch(self.url_for(guess)))
+                listing = await asyncio.to_thread(parse_listing, *body)
+                yield cursor, listing
+                if listing is None or not listing.has_more or not listing.product_ids:
+                    return
+
+                next_cursor = listing.next_cursor
+                if next_cursor is None:
+                    next_cursor = cursor + len(listing.product_ids) if isinstance(cursor, int) else None
+                elif isinstance(next_cursor, str) and next_cursor.isdigit():
+                    next_cursor = int(next_cursor)
+                if next_cursor is None:
+                    return
+                if not isinstance(next_cursor, int):
+                    self._speculate = False
+                if pending is not None and next_cursor == prefetched:
+                    self.prefetch_hits += 1
+                else:
+                    if pending is not None:
+                        pending.cancel()
+                    pending = asyncio.create_task(fetch(self.url_for(next_cursor)))
+                cursor = next_cursor
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def refresh(self, fetch, on_new=None):
+        """
+        Walks the listing and diffs it against the known ids. New ids are passed to
+        `on_new(ids)` page by page as they are found. A refresh whose first page shows
+        the known total and only known ids stops there. Ids are only dropped after a
+        complete walk. Returns (added, removed).
+        """
+        incremental = bool(self.product_ids)
+        seen = set()
+        added = []
+        complete = False
+        async with aclosing(self.pages(fetch)) as pages:
+            async for cursor, listing in pages:
+                if listing is None:
+                    logging.warning(f"Shop {self.shop}: listing page at cursor {cursor} failed; keeping known products.")
+                    break
+                new = [pid for pid in listing.product_ids if pid not in self.product_ids and pid not in seen]
+                seen.update(listing.product_ids)
+                if listing.total is not None:
+                    self.total = int(listing.total)
+                if new:
+                    added.extend(new)
+                    if on_new is not None:
+                        on_new(new)
+                if incremental and cursor == 0 and not new and self.total == len(self.product_ids):
+                    self.refreshed_at = time.time()
+                    return [], []
+                if not listing.has_more or not listing.product_ids:
+                    complete = True
+
+        removed = sorted(self.product_ids - seen) if complete else []
+        self.product_ids.update(added)
+        self.product_ids.difference_update(removed)
+        self.refreshed_at = time.time()
+        return added, removed
+
+    def stats(self):
+        return {"shop": self.shop, "products": len(self.product_ids), "total": self.total,
+                "pages_fetched": self.pages_fetched, "prefetch_hits": self.prefetch_hits,
+                "refreshed_at": self.refreshed_at}
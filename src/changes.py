@@ -0,0 +1,94 @@
+import json
+import time
+
+from store import to_epoch
+
+# Fields whose change makes a sample worth a delta record
+TRACKED_FIELDS = ("total_stock", "total_sold", "price", "currency", "status", "title", "skus")
+
+
+def _fingerprint(values):
+    # The skus list (of dicts) is unhashable; hash its canonical JSON instead
+    return hash(tuple(json.dumps(v, sort_keys=True) if isinstance(v, (list, dict)) else v for v in values))
+
+
+class ChangeDetector:
+    """
+    Turns a stream of full samples into compact records per product.
+
+    - "snapshot": the full sample; emitted for the first sample of a product and
+      then at least every `snapshot_hours`.
+    - "delta": product_id, timestamp and only the tracked fields that changed
+      (a changed `skus` list is carried whole).
+    - "heartbeat": product_id and timestamp when nothing changed; only every
+      `heartbeat_every`-th unchanged sample is emitted, the others return None.
+    Change detection compares a per-product fingerprint of TRACKED_FIELDS.
+    """
+
+    def __init__(self, snapshot_hours=24, heartbeat_every=1):
+        self.snapshot_seconds = snapshot_hours * 3600
+        self.heartbeat_every = max(1, int(heartbeat_every))
+        # product_id -> [fingerprint, tracked values, last snapshot ts, unchanged count]
+        self._state = {}
+
+    def encode(self, sample):
+        product_id = sample.get("product_id")
+        values = tuple(sample.get(field) for field in TRACKED_FIELDS)
+        fingerprint = _fingerprint(values)
+        try:
+            ts = to_epoch(sample["timestamp"])
+        except (KeyError, ValueError):
+            ts = time.time()
+
+        state = self._state.get(product_id)
+        if state is None or ts - state[2] >= self.snapshot_seconds:
+            self._state[product_id] = [fingerprint, values, ts, 0]
+            return dict(sample, record_type="snapshot")
+
+        if fingerprint == state[0] and values == state[1]:
+            state[3] += 1
+            if state[3] % self.heartbeat_every:
+                return None
+            return {"record_type": "heartbeat", "product_id": product_id, "timestamp": sample.get("timestamp")}
+
+        changes = {field: new for field, old, new in zip(TRACKED_FIELDS, state[1], values) if old != new}
+        state[0], state[1], state[3] = fingerprint, values, 0
+        return {"record_type": "delta", "product_id": product_id, "timestamp": sample.get("timestamp"), **changes}
+
+    def state(self):
+        """Per-product [tracked values, last snapshot ts, unchanged count] for a checkpoint."""
+        return {str(pid): [list(s[1]), s[2], s[3]] for pid, s in self._state.items()}
+
+    def restore(self, state):
+        """Reloads state() output. Fingerprints are recomputed: hash() differs between processes."""
+        for product_id, (values, snapshot_ts, unchanged) in state.items():
+            if len(values) != len(TRACKED_FIELDS):
+                # Saved with another field list: the next sample starts with a snapshot
+                continue
+            values = tuple(values)
+            self._state[product_id] = [_fingerprint(values), values, snapshot_ts, unchanged]
+
+    def forget(self, product_id):
+        self._state.pop(product_id, None)
+
+
+def expand_records(records):
+    """
+    Rebuilds full samples from a snapshot/delta/heartbeat stream (records in time
+    order per product). Records without a record_type pass through unchanged.
+    """
+    current = {}
+    for record in records:
+        record_type = record.get("record_type")
+        if record_type is None:
+            yield record
+            continue
+        product_id = record.get("product_id")
+        if record_type == "snapshot":
+            current[product_id] = {k: v for k, v in record.items() if k != "record_type"}
+        elif product_id in current:
+            current[product_id] = dict(current[product_id], **{k: v for k, v in record.items() if k != "record_type"})
+        else:
+            # Delta/heartbeat before any snapshot: nothing to expand against
+            continue
+        yield dict(current[product_id])
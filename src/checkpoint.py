@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+
+STATE_VERSION = 1
+
+
+class StateCheckpoint:
+    """
+    Monitor state saved for warm resume after a restart or an Apify migration.
+
+    State is plain JSON data (run window, per-url due times, adaptive intervals,
+    last-seen tracked values). It is written to the local file `path` (tmp file,
+    fsync, rename) and, when `kv_store` is given (the Apify Actor), to its default
+    key-value store under `key`, which survives migrations. Loading prefers the
+    key-value store. States are tagged with the run's `fingerprint` (see
+    input_fingerprint) and a state saved for different input is not loaded.
+    """
+
+    def __init__(self, path="monitor_state.json", kv_store=None, key="MONITOR_STATE", fingerprint=None):
+        self.path = path
+        self.kv_store = kv_store
+        self.key = key
+        self.fingerprint = fingerprint
+        self.saves = 0
+
+    def _read_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write_file(self, state):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def load(self):
+        """The last saved state, or None when there is none (or it is unreadable, from another version or another input)."""
+        state = None
+        try:
+            if self.kv_store is not None:
+                state = await self.kv_store.get_value(self.key)
+            if state is None:
+                state = self._read_file()
+        except Exception as e:
+            logging.warning(f"Could not load monitor state: {e}")
+            return None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return None
+        if state.get("input") != self.fingerprint:
+            logging.info("Saved monitor state belongs to a different input; starting a new run.")
+            return None
+        return state
+
+    async def save(self, state):
+        state = dict(state, version=STATE_VERSION, input=self.fingerprint, saved_at=time.time())
+        try:
+            if self.path:
+                await asyncio.to_thread(self._write_file, state)
+            if self.kv_store is not None:
+                await self.kv_store.set_value(self.key, state)
+            self.saves += 1
+        except Exception as e:
+            logging.warning(f"Could not save monitor state: {e}")
+
+
+def input_fingerprint(targets, interval_hours, duration_days):
+    """Digest of what a run monitors (product keys, shops) and how, to match a checkpoint to its run."""
+    data = json.dumps({"targets": sorted(targets), "interval_hours": float(interval_hours),
+                       "duration_days": float(duration_days)})
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def resume_due_times(urls, saved, now=None, stagger_seconds=900, rng=random):
+    """
+    Due times for `urls` on resume. Urls whose saved due time is still ahead keep it;
+    overdue urls (in saved due order) and urls without one are spread over
+    `stagger_seconds`, one jittered slot each, so a restart does not re-poll the whole
+    fleet at once.
+    """
+    now = time.time() if now is None else now
+    dues = {}
+    pending = []
+    for url in urls:
+        due = saved.get(url)
+        if due is not None and due > now:
+            dues[url] = due
+        else:
+            pending.append((due if due is not None else float("inf"), url))
+    pending.sort()
+    slot = stagger_seconds / len(pending) if pending else 0
+    for i, (_, url) in enumerate(pending):
+        dues[url] = now + (i + rng.random()) * slot
+    return dues
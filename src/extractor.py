@@ -0,0 +1,137 @@
+import json
+import logging
+
+# Prefer a fast JSON backend when installed; both accept raw bytes
+try:
+    import orjson
+
+    def loads(payload):
+        return orjson.loads(payload)
+
+    JSON_ERRORS = (orjson.JSONDecodeError, ValueError)
+except ImportError:
+    orjson = None
+
+    def loads(payload):
+        return json.loads(bytes(payload))
+
+    JSON_ERRORS = (json.JSONDecodeError, ValueError)
+
+# Hydration payload locations, in the order the old regex fallbacks tried them
+PATTERN_NAMES = [
+    "SIGI_STATE script",
+    "__UNIVERSAL_DATA_FOR_REHYDRATION__ script",
+    "window['SIGI_STATE']",
+    "window.__UNIVERSAL_DATA_FOR_REHYDRATION__",
+]
+
+_SCRIPT_OPEN = b'<script id="'
+_SCRIPT_TYPE = b'" type="application/json">'
+_SCRIPT_END = b"</script>"
+_WHITESPACE = b" \t\r\n"
+
+# (script pattern index, window pattern index, marker name, window prefix, window suffix)
+_MARKER_NAMES = (
+    (0, 2, b"SIGI_STATE", b"window['", b"']"),
+    (1, 3, b"__UNIVERSAL_DATA_FOR_REHYDRATION__", b"window.", b""),
+)
+
+
+def _skip_whitespace(body, pos):
+    while pos < len(body) and body[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _preceded_by(body, pos, prefix):
+    # Explicit bounds check: a negative start would make startswith count from the end
+    return pos >= len(prefix) and body.startswith(prefix, pos - len(prefix))
+
+
+def _markers(body, marker, pos=0):
+    """
+    Finds the payload start offsets of one marker name's script/window forms.
+
+    The name is located with bytes.find (a C-level forward scan); the few bytes
+    around a hit decide which form it is. The scan stops at the first script form,
+    since that outranks everything found later. Returns ({pattern_index: start}, resume_pos).
+    """
+    script_index, window_index, name, window_prefix, window_suffix = marker
+    found = {}
+    pos = body.find(name, pos)
+    while pos != -1:
+        after = pos + len(name)
+        if _preceded_by(body, pos, _SCRIPT_OPEN) and body.startswith(_SCRIPT_TYPE, after):
+            found[script_index] = after + len(_SCRIPT_TYPE)
+            return found, after
+        if window_index not in found and _preceded_by(body, pos, window_prefix) \
+                and body.startswith(window_suffix, after):
+            start = _skip_whitespace(body, after + len(window_suffix))
+            if body.startswith(b"=", start):
+                found[window_index] = _skip_whitespace(body, start + 1)
+        pos = body.find(name, after)
+    return found, -1
+
+
+_RAW_DECODER = json.JSONDecoder()
+
+
+def _decode(body, view, index, start):
+    end = body.find(_SCRIPT_END, start)
+    if end == -1:
+        end = len(body)
+    if index >= 2:
+        # window[...] = {...}; -- the script usually ends with the object, so try the
+        # slice up to its last brace first and only scan for the value's end on failure
+        script_end = end
+        end = body.rfind(b"}", start, end) + 1
+        if end <= start:
+            return None
+        try:
+            return loads(view[start:end])
+        except JSON_ERRORS:
+            # More statements follow in the same script (window['SIGI_RETRY']=...)
+            try:
+                return _RAW_DECODER.raw_decode(body[start:script_end].decode("utf-8", "replace"))[0]
+            except ValueError as e:
+                logging.warning(f"Found match but failed to decode JSON: {e}")
+                return None
+    try:
+        return loads(view[start:end])
+    except JSON_ERRORS as e:
+        logging.warning(f"Found match but failed to decode JSON: {e}")
+        return None
+
+
+def find_hydration_json(body):
+    """
+    Locates the embedded hydration JSON in a raw HTML body (bytes) and decodes it.
+
+    The body is never decoded as a whole: markers are located by byte offset and
+    only the JSON payload of the chosen script is sliced and decoded. A page with
+    a SIGI_STATE script is resolved in one forward scan that stops at the script.
+    Returns (json_data, pattern_name), or (None, None) when nothing decodes.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    view = memoryview(body)
+    windows = {}
+    for marker in _MARKER_NAMES:
+        script_index, window_index = marker[0], marker[1]
+        pos = 0
+        while pos != -1:
+            found, pos = _markers(body, marker, pos)
+            if window_index in found:
+                windows.setdefault(window_index, found[window_index])
+            if script_index in found:
+                json_data = _decode(body, view, script_index, found[script_index])
+                if json_data is not None:
+                    return json_data, PATTERN_NAMES[script_index]
+
+    for index in sorted(windows):
+        json_data = _decode(body, view, index, windows[index])
+        if json_data is not None:
+            return json_data, PATTERN_NAMES[index]
+
+    return None, None
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+_IMPORTED = time.time()
+
+# Upper bounds (seconds) shared by every stage histogram; +Inf is implicit
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram: one bisect and two additions per observation."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """
+    In-process registry of stage timings and counters.
+
+    `timer(stage)` / `observe_stage()` feed the `stage_seconds` histogram (sign,
+    fetch, decode, extract, store, push); `inc()` bumps counters such as
+    bytes_downloaded_total or extraction_total{path=...}. `render()` produces the
+    Prometheus text format and `snapshot()` a JSON-friendly dict; collectors add
+    extra sections (e.g. proxy stats) to the snapshot.
+    """
+
+    def __init__(self, prefix="tiktok_monitor"):
+        self.prefix = prefix
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def observe_stage(self, stage, seconds):
+        self.observe("stage_seconds", seconds, stage=stage)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.started = time.time()
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {self.prefix}_{name} counter")
+            for (counter, labels), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f"{self.prefix}_{name}{_label_str(labels)} {value}")
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f"# TYPE {self.prefix}_{name} histogram")
+            for (histogram_name, labels), h in sorted(self.histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.prefix}_{name}_bucket{_label_str(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{self.prefix}_{name}_sum{_label_str(labels)} {h.sum}")
+                lines.append(f"{self.prefix}_{name}_count{_label_str(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        data = {"timestamp": time.time(), "uptime_seconds": time.time() - self.started,
+                "stages": {}, "counters": {}}
+        for (name, labels), h in self.histograms.items():
+            if name == "stage_seconds":
+                section, label = data["stages"], dict(labels)["stage"]
+            else:
+                section, label = data.setdefault("histograms", {}), name + _label_str(labels)
+            section[label] = {
+                "count": h.count,
+                "mean": h.sum / h.count if h.count else None,
+                "p50": h.quantile(0.50),
+                "p95": h.quantile(0.95),
+                "p99": h.quantile(0.99),
+            }
+        for (name, labels), value in self.counters.items():
+            data["counters"][name + _label_str(labels)] = value
+        for section, collect in self.collectors.items():
+            try:
+                data[section] = collect()
+            except Exception as e:
+                data[section] = {"error": str(e)}
+        return data
+
+
+# Process-wide registry; parse workers report their timings back to the parent
+METRICS = Metrics()
+
+
+async def _handle(reader, writer, metrics):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1] if len(parts) > 1 else "/"
+        if path.startswith("/metrics.json"):
+            status, content_type, body = "200 OK", "application/json", json.dumps(metrics.snapshot()).encode()
+        elif path.startswith("/metrics"):
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", metrics.render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except Exception as e:
+        logging.warning(f"Metrics request failed: {e}")
+    finally:
+        writer.close()
+
+
+def process_start_time():
+    """Epoch seconds at which this process started (from /proc on Linux, else when metrics was imported)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return _IMPORTED
+
+
+async def serve_metrics(port, metrics=METRICS, host="0.0.0.0"):
+    """Serves GET /metrics (Prometheus text) and /metrics.json on the running loop; returns the server."""
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, metrics), host, port)
+    logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+
+def write_snapshot(path, snapshot):
+    """
+    Writes a snapshot() dict to path (tmp file + rename). Take the snapshot on the event
+    loop, since collectors read live state; only this write belongs in a worker thread.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
@@ -3,22 +3,105 @@ import sys
 import json
 import logging
 import time
-import requests
-from curl_cffi import requests as cffi_requests
 import asyncio
-import re
 from datetime import datetime, timedelta
+from urllib.parse import urlparse, urlencode, urlunparse
+
+from aggregates import AggregateBook
+from archive import ResponseArchive
+from catalog import ShopCatalog
+from changes import ChangeDetector
+from checkpoint import StateCheckpoint, input_fingerprint, resume_due_times
+from output import DatasetWriter
+from metrics import METRICS, process_start_time, serve_metrics, write_snapshot
+from parsing import ParsePool, default_workers, parse_timed, record_parse_stats
+# The parsers used to live here; kept importable from monitor for existing scripts
+from parsing import extract_product_info, parse_html_for_data, parse_response  # noqa: F401
+from products import DEFAULT_PRODUCT_URL, dedupe_urls, parse_shop_url
+from proxies import ProxyPool, is_proxy_failure, redact_url
+from retry import RETRY_STATUSES, CircuitBreaker, HedgePolicy, RetryPolicy, TransientError
+from scheduler import AdaptiveIntervalPolicy, FleetScheduler
+from sessions import SessionPool, DEFAULT_IMPERSONATE
+from signer import SignerClient, SignerPool
+from store import SampleStore
 
 # Try importing Apify Actor SDK
 try:
     from apify import Actor
 except ImportError:
     Actor = None
+try:
+    from apify import Event
+except ImportError:
+    Event = None
 
 # Configuration
 SIGNATURE_SERVICE_URL = "http://localhost:8081/signature"
+# Comma-separated list of signer instances for the fleet monitor (defaults to the single local one)
+SIGNATURE_SERVICE_URLS = [u.strip() for u in os.environ.get("SIGNATURE_SERVICE_URLS", SIGNATURE_SERVICE_URL).split(",") if u.strip()]
+SIGNER_PROBE_INTERVAL = 30
+# How long the fleet waits for a signer to report a loaded byted_acrawler before polling anyway
+SIGNER_READY_TIMEOUT = float(os.environ.get("SIGNER_READY_TIMEOUT", 120))
 MONITOR_LOG_FILE = "monitor_log.jsonl"
-DEBUG_LOG_FILE = "debug_response.txt"
+# Sample storage: "sqlite" (indexed, WAL mode) or "jsonl" (legacy append-only log)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlite")
+MONITOR_DB_FILE = os.environ.get("MONITOR_DB_FILE", "monitor.db")
+STORE_FLUSH_INTERVAL = 5
+# Running per-product aggregates, compacted to disk every AGGREGATE_CHECKPOINT_INTERVAL seconds
+AGGREGATES_FILE = os.environ.get("AGGREGATES_FILE", "aggregates.json")
+AGGREGATE_CHECKPOINT_INTERVAL = 300
+# Scheduler state for warm resume; also kept in the Actor's key-value store when running on Apify
+MONITOR_STATE_FILE = os.environ.get("MONITOR_STATE_FILE", "monitor_state.json")
+STATE_CHECKPOINT_INTERVAL = 60
+# Overdue products are spread over this window (at most one interval) when a run resumes
+RESUME_STAGGER_SECONDS = float(os.environ.get("RESUME_STAGGER_SECONDS", 900))
+# Shop inputs (https://www.tiktok.com/@shop) are expanded through this paginated listing
+# endpoint ({shop}, {cursor}, {count}); override SHOP_LIST_URL if TikTok moves it
+SHOP_LIST_URL = os.environ.get(
+    "SHOP_LIST_URL", "https://www.tiktok.com/api/shop/store/product_list/?seller={shop}&cursor={cursor}&count={count}"
+)
+SHOP_PAGE_SIZE = 30
+SHOP_MAX_PAGES = 200
+SHOP_REFRESH_HOURS = 6
+SHOP_RETRY_SECONDS = 300
+# Delta records: full snapshot at least every SNAPSHOT_HOURS, heartbeat on every HEARTBEAT_EVERY-th unchanged sample
+SNAPSHOT_HOURS = 24
+HEARTBEAT_EVERY = 1
+# Dataset pushes: batch size, max seconds a partial batch waits, and queue bound (backpressure)
+PUSH_BATCH_SIZE = 100
+PUSH_FLUSH_INTERVAL = 5.0
+PUSH_QUEUE_SIZE = 1000
+REQUEST_TIMEOUT = 30
+# Per-attempt timeout for product fetches; retries and hedging cover the slow tail
+FETCH_TIMEOUT = 15
+# Retries with jittered exponential backoff, per stage
+SIGN_RETRY = RetryPolicy(attempts=3, base_delay=1.0, max_delay=10.0, name="Signing")
+FETCH_RETRY = RetryPolicy(attempts=3, base_delay=2.0, max_delay=30.0, name="Fetch")
+# Hedged fetches: duplicate a request still running after this latency percentile (0 disables)
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", 0))
+# The fleet pauses for SIGNER_BREAKER_RESET seconds after SIGNER_BREAKER_FAILURES consecutive signing failures
+SIGNER_BREAKER_FAILURES = 5
+SIGNER_BREAKER_RESET = 30
+# Proxy pool stats are logged every PROXY_STATS_INTERVAL seconds (pool from PROXY_URLS or HTTP(S)_PROXY)
+PROXY_STATS_INTERVAL = 300
+# Per-host request rate floor. Without an explicit host_rate the fleet raises it to
+# products / interval x HOST_RATE_HEADROOM, so the limiter never caps a full polling round
+DEFAULT_HOST_RATE = 2.0
+HOST_RATE_HEADROOM = 1.5
+# Parse worker processes for the fleet monitor (0 = parse on the event loop thread)
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", default_workers()))
+# Metrics: Prometheus text on METRICS_PORT (0 = no endpoint) and a JSON snapshot every METRICS_INTERVAL seconds
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_FILE = os.environ.get("METRICS_FILE", "metrics.json")
+METRICS_INTERVAL = 60
+# Signing: cache lifetimes (seconds) and how concurrent sign calls are coalesced
+SIGNATURE_CACHE_TTL = 300
+IDENTITY_CACHE_TTL = 900
+SIGN_BATCH_SIZE = 50
+SIGN_BATCH_WINDOW = 0.05
+
+# Raw-response archive (RAW_ARCHIVE_MODE=off|sampled|failures|all, RAW_ARCHIVE_DIR, RAW_ARCHIVE_SAMPLE_RATE)
+RAW_ARCHIVE = ResponseArchive.from_env()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,6 +110,9 @@ def get_signed_url(url):
     """
     Calls the local Node.js signature service to get X-Bogus/X-Gnarly.
     """
+    # Only the legacy single-product path signs this way; keep `requests` out of the fleet's startup
+    import requests
+
     try:
         response = requests.post(SIGNATURE_SERVICE_URL, json={"url": url})
         response.raise_for_status()
@@ -40,240 +126,718 @@ def get_signed_url(url):
         logging.error(f"Error calling signature service: {e}")
         return None
 
-def parse_html_for_data(html_content, product_url):
+def build_signed_request(product_url, signed_data):
     """
-    Parses HTML content to find embedded JSON data (SIGI_STATE, __UNIVERSAL_DATA, etc.).
+    Builds the final signed URL and matching headers from the signature service response.
+    The signature is appended to the exact URL that was signed (`url` in signed data from
+    SignerClient, else product_url), leaving its existing query string untouched.
     """
-    logging.info("Parsing HTML for embedded data...")
-    
-    # List of patterns to look for
-    patterns = [
-        r'<script id="SIGI_STATE" type="application/json">(.*?)</script>',
-        r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>',
-        r'window\[\'SIGI_STATE\'\]\s*=\s*({.*?});',
-        r'window\.__UNIVERSAL_DATA_FOR_REHYDRATION__\s*=\s*({.*?});'
-    ]
-    
-    json_data = None
-    
-    for pattern in patterns:
-        match = re.search(pattern, html_content, re.DOTALL)
-        if match:
-            try:
-                json_str = match.group(1)
-                json_data = json.loads(json_str)
-                logging.info(f"Found JSON data using pattern: {pattern[:20]}...")
-                break
-            except json.JSONDecodeError as e:
-                logging.warning(f"Found match but failed to decode JSON: {e}")
-                continue
-                
-    if not json_data:
-        logging.warning("No JSON data found in HTML.")
-        # Attempt fallback: Look for "ItemModule" or similar direct structures if full hydration failed
-        return None
-
-    # Extraction Logic
-    # The structure varies. We need to find the Product info.
-    try:
-        # Common paths in SIGI_STATE / Universal Data
-        # 1. ItemModule -> <id>
-        # 2. ProductDetail -> ...
-        # 3. 'webapp.video-detail' -> ...
-        
-        product_info = {}
-        
-        # Helper to find product data in nested dicts
-        # We look for "stock" and "price" keys
-        
-        # Strategy: Flatten or search? 
-        # Let's try known paths first.
-        
-        item_data = None
-        
-        if "ItemModule" in json_data:
-            # Usually keyed by video ID or product ID
-            for key, val in json_data["ItemModule"].items():
-                if val and ("price" in val or "stock" in val):
-                    item_data = val
-                    break
-                    
-        if not item_data and "ProductDetail" in json_data:
-             item_data = json_data.get("ProductDetail")
-
-        # Universal Data structure (e.g. from __UNIVERSAL_DATA__)
-        if not item_data and "__DEFAULT_SCOPE__" in json_data:
-             scope = json_data["__DEFAULT_SCOPE__"]
-             if "webapp.product-detail" in scope:
-                 item_data = scope["webapp.product-detail"].get("productInfo")
-        
-        if item_data:
-            return {
-                "timestamp": datetime.now().isoformat(),
-                "url": product_url,
-                "product_id": item_data.get("id") or item_data.get("product_id") or "unknown",
-                "title": item_data.get("title") or item_data.get("name"),
-                "total_stock": item_data.get("stock", 0) or item_data.get("quantity", 0),
-                "total_sold": item_data.get("sold_count", 0) or item_data.get("sales", 0),
-                "price": item_data.get("price", {}).get("min_price") or item_data.get("price", 0),
-                "currency": item_data.get("price", {}).get("currency") or "USD",
-                "status": "active" if item_data.get("status") == 1 else "inactive",
-                "raw_response_snippet": "HTML Parsing Success"
-            }
-            
-        logging.warning("JSON found but could not locate specific Product Info inside.")
-        return None
-
-    except Exception as e:
-        logging.error(f"Error extracting data from JSON: {e}")
-        return None
-
-def fetch_product_data(product_url):
-    """
-    Fetches product data using signed requests and curl_cffi for TLS impersonation.
-    """
-    logging.info(f"Fetching data for {product_url}...")
-    
-    # 1. Get signed URL and headers
-    signed_data = get_signed_url(product_url)
-    if not signed_data:
-        logging.error("Failed to get signed URL.")
-        return None
-
     signature_obj = signed_data.get("signed_url")
     cookies = signed_data.get("cookies")
     user_agent = signed_data.get("navigator", {}).get("user_agent")
+    base_url = signed_data.get("url") or product_url
     
     # Construct the final URL with X-Bogus
     if isinstance(signature_obj, dict):
-        from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-        
-        parsed = urlparse(product_url)
-        query = parse_qs(parsed.query)
-        
-        # Add X-Bogus
-        if "X-Bogus" in signature_obj:
-            query["X-Bogus"] = signature_obj["X-Bogus"]
-        if "X-Gnarly" in signature_obj:
-            query["X-Gnarly"] = signature_obj["X-Gnarly"]
-            
-        new_query = urlencode(query, doseq=True)
+        parsed = urlparse(base_url)
+        extra = urlencode([(name, signature_obj[name]) for name in ("X-Bogus", "X-Gnarly") if name in signature_obj])
+        new_query = "&".join(part for part in (parsed.query, extra) if part)
         signed_url = urlunparse(parsed._replace(query=new_query))
     else:
-        signed_url = signature_obj if isinstance(signature_obj, str) else product_url
+        signed_url = signature_obj if isinstance(signature_obj, str) else base_url
 
     headers = {
         "User-Agent": user_agent,
         "Cookie": cookies,
         "Referer": "https://www.tiktok.com/"
     }
+    return signed_url, headers
 
-    # Proxy Configuration
-    proxies = None
+def get_proxies():
+    """
+    Proxy configuration from HTTP_PROXY/HTTPS_PROXY, or None.
+    """
     if os.environ.get("HTTP_PROXY"):
-        proxies = {"http": os.environ.get("HTTP_PROXY"), "https": os.environ.get("HTTPS_PROXY")}
+        return {"http": os.environ.get("HTTP_PROXY"), "https": os.environ.get("HTTPS_PROXY")}
+    return None
+
+def fetch_product_data(product_url):
+    """
+    Fetches product data using signed requests and curl_cffi for TLS impersonation.
+    Signing and fetching are retried with backoff on transient failures.
+    """
+    logging.info(f"Fetching data for {product_url}...")
+    # Like `requests` in get_signed_url: only this legacy path uses the sync client
+    from curl_cffi import requests as cffi_requests
+    from curl_cffi.requests.exceptions import RequestException
     
+    # 1. Get signed URL and headers
+    def sign_once():
+        signed = get_signed_url(product_url)
+        if not signed:
+            raise TransientError("signature service returned no signature")
+        return signed
+
     try:
+        with METRICS.timer("sign"):
+            signed_data = SIGN_RETRY.run_sync(sign_once, product_url)
+    except TransientError:
+        METRICS.inc("failures_total", stage="sign")
+        logging.error("Failed to get signed URL.")
+        return None
+
+    signed_url, headers = build_signed_request(product_url, signed_data)
+
+    # Proxy Configuration
+    proxies = get_proxies()
+
+    def fetch_once():
         # Use curl_cffi with Chrome impersonation
         # Note: We override User-Agent to match the signature.
-        logging.info("Sending request via curl_cffi with impersonate='chrome124'...")
-        response = cffi_requests.get(
-            signed_url, 
-            headers=headers, 
-            impersonate="chrome124",
-            proxies=proxies,
-            timeout=30
-        )
+        logging.info(f"Sending request via curl_cffi with impersonate='{DEFAULT_IMPERSONATE}'...")
+        try:
+            response = cffi_requests.get(
+                signed_url, 
+                headers=headers, 
+                impersonate=DEFAULT_IMPERSONATE,
+                proxies=proxies,
+                timeout=FETCH_TIMEOUT
+            )
+        except RequestException as e:
+            raise TransientError(str(e)) from e
+        if response.status_code in RETRY_STATUSES:
+            raise TransientError(f"HTTP {response.status_code}")
         response.raise_for_status()
+        return response
+    
+    try:
+        with METRICS.timer("fetch"):
+            response = FETCH_RETRY.run_sync(fetch_once, product_url)
+        METRICS.inc("bytes_downloaded_total", len(response.content))
         
         content_type = response.headers.get("Content-Type", "")
-        
-        # Debug save
-        with open(DEBUG_LOG_FILE, "wb") as f:
-            f.write(response.content)
-            
-        if "application/json" in content_type:
-            try:
-                data = response.json()
-                return extract_product_info(data, product_url)
-            except json.JSONDecodeError:
-                logging.error("Failed to decode JSON response.")
-                return None
-        elif "text/html" in content_type:
-            # Decode content to string (handle encoding)
-            try:
-                html_text = response.content.decode('utf-8', errors='ignore')
-                return parse_html_for_data(html_text, product_url)
-            except Exception as e:
-                logging.error(f"Error processing HTML: {e}")
-                return None
-        else:
-            logging.warning(f"Response content type is {content_type}. Might be Protobuf.")
-            return None
+        result, stats = parse_timed(response.content, content_type, product_url)
+        record_parse_stats(stats, result)
+
+        # Raw response goes to the archive (off / sampled / failures) via its background writer
+        RAW_ARCHIVE.record(product_url, response.content, content_type, response.status_code, result)
+        return result
 
     except Exception as e:
+        METRICS.inc("failures_total", stage="fetch")
         logging.error(f"Request failed: {e}")
         return None
 
-def extract_product_info(json_data, product_url):
+async def fetch_once_async(product_url, signed_url, headers, sessions, proxies=None, hedge=None, in_flight=None):
+    """
+    One GET for product_url through its proxy. Raises TransientError for failures worth
+    retrying; a hedged duplicate skips the proxies listed in `in_flight`.
+    """
+    proxy = None
+    if proxies is not None:
+        proxy = proxies.acquire(product_url, exclude=in_flight or ())
+        if in_flight is not None and proxy is not None:
+            in_flight.append(proxy)
+    session = sessions.get(proxy.proxies if proxy is not None else get_proxies())
+    # Loaded by the session pool already; a cached lookup from here on
+    from curl_cffi.requests.exceptions import RequestException
+    latency = status = None
+
     try:
-        product_data = json_data.get("data", {})
-        if not product_data:
-            logging.warning("No 'data' field in JSON response.")
-            return None
+        started = time.monotonic()
+        try:
+            response = await session.get(signed_url, headers=headers, timeout=FETCH_TIMEOUT)
+        except RequestException as e:
+            raise TransientError(str(e)) from e
+        latency = time.monotonic() - started
+        status = response.status_code
+        METRICS.inc("responses_total", status=status)
+        if hedge is not None:
+            hedge.observe(latency)
+        if status in RETRY_STATUSES:
+            raise TransientError(f"HTTP {status}")
+        response.raise_for_status()
+        return response
+    except asyncio.CancelledError:
+        # Lost a hedge race: not the proxy's fault
+        if proxy is not None:
+            proxies.abandon(proxy)
+            proxy = None
+        raise
+    finally:
+        if in_flight is not None and proxy is not None and proxy in in_flight:
+            in_flight.remove(proxy)
+        if proxy is not None:
+            proxies.release(proxy, latency, status, ok=not is_proxy_failure(status), key=product_url)
+
+async def fetch_signed_async(url, sessions, signer, proxies=None, breaker=None, hedge=None):
+    """
+    Signs url and fetches it, both with retries (SIGN_RETRY, FETCH_RETRY). A CircuitBreaker
+    holds signing while the signer is down, and a HedgePolicy duplicates slow fetches.
+    Returns the response, or None when signing or fetching failed for good.
+    """
+    async def sign_once():
+        # The signer client records each service request's outcome on the breaker
+        trial = await breaker.acquire() if breaker is not None else None
+        try:
+            signed = await signer.sign(url)
+        finally:
+            if trial is not None:
+                # Cancelled, failed or answered from the cache without a recorded result
+                breaker.end_trial(trial)
+        if not signed:
+            raise TransientError("signature service returned no signature")
+        return signed
+
+    try:
+        with METRICS.timer("sign"):
+            signed_data = await SIGN_RETRY.run(sign_once, url)
+    except TransientError:
+        METRICS.inc("failures_total", stage="sign")
+        logging.error("Failed to get signed URL.")
+        return None
+
+    signed_url, headers = build_signed_request(url, signed_data)
+    in_flight = []
+
+    async def fetch_once():
+        return await fetch_once_async(url, signed_url, headers, sessions, proxies, hedge, in_flight)
+
+    async def attempt():
+        return await (hedge.run(fetch_once) if hedge is not None else fetch_once())
+
+    try:
+        with METRICS.timer("fetch"):
+            response = await FETCH_RETRY.run(attempt, url)
+    except Exception as e:
+        METRICS.inc("failures_total", stage="fetch")
+        logging.error(f"Request failed: {e}")
+        return None
+    METRICS.inc("bytes_downloaded_total", len(response.content))
+    return response
+
+async def fetch_product_data_async(product_url, sessions, signer, parser=None, proxies=None, breaker=None, hedge=None):
+    """
+    Async variant of fetch_product_data. Signing goes through the cached, batching
+    SignerClient and fetching through pooled AsyncSessions, so concurrent fetches
+    overlap and reuse connections. With a ParsePool, parsing runs in worker processes.
+    With a ProxyPool, each product is fetched through its assigned exit node and the
+    outcome is fed back into the pool's latency/error scores.
+    """
+    logging.info(f"Fetching data for {product_url}...")
+    response = await fetch_signed_async(product_url, sessions, signer, proxies, breaker, hedge)
+    if response is None:
+        return None
+
+    try:
+        content_type = response.headers.get("Content-Type", "")
+        if parser is not None:
+            result = await parser.parse(response.content, content_type, product_url)
+        else:
+            result, stats = parse_timed(response.content, content_type, product_url)
+            record_parse_stats(stats, result)
+
+        RAW_ARCHIVE.record(product_url, response.content, content_type, response.status_code, result)
+        return result
 
-        item = product_data.get("product_info", {})
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "url": product_url,
-            "product_id": item.get("product_id", "unknown"),
-            "total_stock": item.get("stock", 0),
-            "total_sold": item.get("sold_count", 0),
-            "price": item.get("price", {}).get("min_price", 0),
-            "raw_response_snippet": str(json_data)[:200]
-        }
     except Exception as e:
-        logging.error(f"Error extracting product info: {e}")
+        METRICS.inc("failures_total", stage="parse")
+        logging.error(f"Processing the response failed: {e}")
+        return None
+
+async def fetch_listing_page_async(page_url, sessions, signer, proxies=None, breaker=None):
+    """
+    Fetches one shop listing page for a ShopCatalog: (content, content_type), or None on failure.
+    """
+    response = await fetch_signed_async(page_url, sessions, signer, proxies, breaker)
+    METRICS.inc("catalog_pages_total", status="ok" if response is not None else "failed")
+    if response is None:
         return None
+    return response.content, response.headers.get("Content-Type", "")
 
-async def monitor_product(url, duration_days=7, interval_hours=1):
-    start_time = datetime.now()
-    end_time = start_time + timedelta(days=duration_days)
+async def refresh_catalogs_periodically(catalogs, fetch, on_new, on_removed, interval=SHOP_REFRESH_HOURS * 3600):
+    """
+    Refreshes each shop catalog when its last refresh is `interval` seconds old (now, for
+    new shops); catalogs still without products retry after SHOP_RETRY_SECONDS.
+    New products go to on_new(ids) as pages arrive; removed ones to on_removed(catalog, ids).
+    """
+    def next_refresh(catalog):
+        if catalog.refreshed_at is None:
+            return 0
+        return catalog.refreshed_at + (interval if catalog.product_ids else min(interval, SHOP_RETRY_SECONDS))
+
+    async def refresh(catalog):
+        try:
+            added, removed = await catalog.refresh(fetch, on_new)
+        except Exception as e:
+            catalog.refreshed_at = time.time()
+            logging.error(f"Catalog refresh failed for shop {catalog.shop}: {e}")
+            return
+        if removed:
+            on_removed(catalog, removed)
+        logging.info(f"Shop {catalog.shop}: {len(catalog.product_ids)} products "
+                     f"({len(added)} new, {len(removed)} removed; {catalog.pages_fetched} listing pages so far).")
+
+    while True:
+        due = [c for c in catalogs if next_refresh(c) <= time.time()]
+        if due:
+            await asyncio.gather(*(refresh(c) for c in due))
+        await asyncio.sleep(max(1.0, min(next_refresh(c) for c in catalogs) - time.time()))
+
+async def write_metrics(path=METRICS_FILE):
+    """
+    Writes the metrics JSON snapshot. The snapshot is taken on the event loop, where the
+    collectors' state is mutated; only the file write runs off it.
+    """
+    snapshot = METRICS.snapshot()
+    try:
+        await asyncio.to_thread(write_snapshot, path, snapshot)
+    except OSError as e:
+        logging.warning(f"Could not write metrics to {path}: {e}")
+
+async def write_metrics_periodically(path=METRICS_FILE, interval=METRICS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        await write_metrics(path)
+
+async def log_proxy_stats_periodically(proxies, interval=PROXY_STATS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        proxies.log_stats()
+
+def open_store():
+    """
+    Opens the configured sample store, or returns None for the legacy JSONL log.
+    """
+    if STORAGE_BACKEND == "jsonl":
+        return None
+    return SampleStore(MONITOR_DB_FILE)
+
+async def flush_store_periodically(store, interval=STORE_FLUSH_INTERVAL):
+    """
+    Writes buffered samples every `interval` seconds, one transaction per flush.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(store.flush)
+
+async def checkpoint_aggregates(aggregates):
+    """
+    Compacts the running aggregates to disk; the file write runs off the event loop.
+    """
+    if aggregates.dirty:
+        await asyncio.to_thread(aggregates.write, aggregates.snapshot())
+
+async def checkpoint_aggregates_periodically(aggregates, interval=AGGREGATE_CHECKPOINT_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        await checkpoint_aggregates(aggregates)
+
+async def save_state_periodically(checkpoint, state, interval=STATE_CHECKPOINT_INTERVAL):
+    """
+    Saves `state()` every `interval` seconds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await checkpoint.save(state())
+
+async def record_sample(current_data, store=None, aggregates=None, changes=None, output=None):
+    """
+    Persists one sample to the sample store (or the local JSONL log) and the Apify dataset,
+    and folds it into the running aggregates. With a ChangeDetector, the JSONL log and
+    the dataset get compact snapshot/delta/heartbeat records instead of full samples.
+    With a DatasetWriter, dataset pushes are queued and sent in batches.
+    """
+    if aggregates is not None:
+        aggregates.update(current_data)
+
+    record = changes.encode(current_data) if changes is not None else current_data
+
+    started = time.perf_counter()
+    if store is not None:
+        # Buffered; written in batches by flush(). Unchanged samples skip their JSON copy
+        changed = record is not None and record.get("record_type") != "heartbeat"
+        if store.add(current_data, changed):
+            await asyncio.to_thread(store.flush)
+    elif record is not None:
+        # Save locally
+        with open(MONITOR_LOG_FILE, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    METRICS.observe_stage("store", time.perf_counter() - started)
+    METRICS.inc("records_total", type=record.get("record_type", "full") if record is not None else "skipped")
+
+    if record is None:
+        # Unchanged and no heartbeat due: nothing to push
+        logging.info(f"No change for {current_data.get('product_id')}; skipped push.")
+        return
+
+    # Push to Apify Dataset if available
+    if output is not None:
+        await output.put(record)
+    elif Actor:
+        await Actor.push_data(record)
+
+    logging.info(f"Data recorded: {record}")
+
+async def monitor_product(url, duration_days=7, interval_hours=1, resume=True):
+    url = next(iter(dedupe_urls([url]).values()))
+    interval = interval_hours * 3600
+    fingerprint = input_fingerprint([url], interval_hours, duration_days)
+    checkpoint = StateCheckpoint(MONITOR_STATE_FILE, Actor, fingerprint=fingerprint)
+    saved = await checkpoint.load() if resume else None
+    if saved and saved["end_ts"] > time.time() and url in saved.get("schedule", {}):
+        start_time = datetime.fromtimestamp(saved["started_at"])
+        end_time = datetime.fromtimestamp(saved["end_ts"])
+        next_due = resume_due_times([url], saved["schedule"], stagger_seconds=min(RESUME_STAGGER_SECONDS, interval))[url]
+        logging.info(f"Resuming monitor started at {start_time}; next poll in {max(0, next_due - time.time()):.0f}s.")
+    else:
+        start_time = datetime.now()
+        end_time = start_time + timedelta(days=duration_days)
+        next_due = time.time()
+    store = open_store()
     
     logging.info(f"Starting monitor for: {url}")
     logging.info(f"Duration: {duration_days} days. Interval: {interval_hours} hours.")
     
     try:
         while datetime.now() < end_time:
+            await asyncio.sleep(max(0, next_due - time.time()))
             current_data = fetch_product_data(url)
             if current_data:
-                # Save locally
-                with open(MONITOR_LOG_FILE, "a") as f:
-                    f.write(json.dumps(current_data) + "\n")
-                
-                # Push to Apify Dataset if available
-                if Actor:
-                    await Actor.push_data(current_data)
-                
-                logging.info(f"Data recorded: {current_data}")
+                await record_sample(current_data, store)
+                if store is not None:
+                    store.flush()
             else:
                 logging.warning("No data fetched this interval.")
-            
-            # Use asyncio sleep if in async context
-            await asyncio.sleep(interval_hours * 3600)
+
+            next_due = max(next_due + interval, time.time())
+            await checkpoint.save({"started_at": start_time.timestamp(), "end_ts": end_time.timestamp(),
+                                   "schedule": {url: next_due}})
             
     except asyncio.CancelledError:
         logging.info("Monitoring cancelled.")
     except KeyboardInterrupt:
         logging.info("Monitoring stopped manually.")
+    finally:
+        if store is not None:
+            store.close()
     
     logging.info("Monitoring finished.")
 
+async def monitor_fleet(urls, duration_days=7, interval_hours=1, max_concurrency=20, host_rate=None, signer_urls=None,
+                        adaptive=False, min_interval_hours=0.25, max_interval_hours=6.0, request_budget=None,
+                        record_mode="delta", dataset=None, parse_workers=None, proxy_urls=None,
+                        hedge_percentile=None, metrics_port=None, resume=True):
+    """
+    Monitors many products from one event loop and one signer.
+    Inputs naming the same product (any URL form, tracking parameters, bare ids) share one schedule entry.
+    Shop inputs (https://www.tiktok.com/@shop) are expanded into their products through the
+    paginated SHOP_LIST_URL listing, which is re-read every SHOP_REFRESH_HOURS to pick up new
+    and drop delisted products.
+    Due times are kept in a heap; polls run with bounded concurrency and a per-host rate limit.
+    `host_rate` (requests/second) defaults to what the product count and interval need, at
+    least DEFAULT_HOST_RATE; an explicit rate below that need is kept but logged.
+    With `adaptive`, each product's interval follows its sales/stock movement between
+    min_interval_hours and max_interval_hours, within `request_budget` requests/hour.
+    record_mode "delta" pushes snapshot/delta/heartbeat records; "full" pushes every sample.
+    Records are pushed in batches to `dataset` (anything with an async push_data,
+    defaults to the Apify Actor) and drained before this returns.
+    Parsing runs on `parse_workers` processes (default: PARSE_WORKERS; 0 parses inline).
+    Fetches rotate over `proxy_urls` (default: PROXY_URLS, then HTTP_PROXY/HTTPS_PROXY).
+    A fetch still running after the `hedge_percentile` latency (default: HEDGE_PERCENTILE,
+    0 disables) gets a duplicate request; polls pause while the signer circuit is open.
+    Stage timings and counters are served on `metrics_port` (default: METRICS_PORT) and
+    written to METRICS_FILE.
+    The schedule, adaptive intervals and last-seen values are checkpointed every
+    STATE_CHECKPOINT_INTERVAL seconds; with `resume`, a restarted run keeps its original
+    end time and spreads overdue products over RESUME_STAGGER_SECONDS.
+    Setup runs while the signer browsers warm up; polling starts once a signer reports
+    ready (or after SIGNER_READY_TIMEOUT).
+    """
+    # Probe the signers first so the browsers' warm-up overlaps everything below
+    sessions = SessionPool(max_clients=max_concurrency)
+    signer_pool = SignerPool(signer_urls or SIGNATURE_SERVICE_URLS, sessions, probe_interval=SIGNER_PROBE_INTERVAL)
+    signer_ready = asyncio.create_task(signer_pool.wait_ready(SIGNER_READY_TIMEOUT))
+
+    started_at = time.time()
+    end_ts = started_at + duration_days * 86400
+    policy = None
+    if adaptive:
+        policy = AdaptiveIntervalPolicy(interval_hours, min_interval_hours, max_interval_hours, request_budget)
+        logging.info(f"Adaptive intervals: {min_interval_hours}-{max_interval_hours} hours, "
+                     f"budget {request_budget or 'unlimited'} requests/hour.")
+    scheduler = FleetScheduler(interval_hours, max_concurrency, host_rate if host_rate is not None else DEFAULT_HOST_RATE,
+                               policy)
+    rate_warned = False
+    logged_rate = DEFAULT_HOST_RATE
+
+    def fit_host_rate():
+        # Every product's polls must fit: one per interval, or the adaptive policy's (budgeted) demand
+        nonlocal rate_warned, logged_rate
+        if policy is not None:
+            per_hour = policy.fleet_demand(len(scheduler))
+        else:
+            per_hour = len(scheduler) / interval_hours
+        needed = per_hour / 3600
+        limiter = scheduler.rate_limiter
+        if host_rate is None:
+            rate = max(DEFAULT_HOST_RATE, needed * HOST_RATE_HEADROOM)
+            if rate != limiter.rate:
+                limiter.set_rate(rate)
+            # Adaptive intervals move the rate a little on every poll; only log real shifts
+            if abs(rate - logged_rate) > 0.25 * logged_rate:
+                logged_rate = rate
+                logging.info(f"Host rate set to {rate:.2f}/s for {per_hour:.0f} requests/hour "
+                             f"across {len(scheduler)} products.")
+        elif 0 < limiter.rate < needed and not rate_warned:
+            rate_warned = True
+            logging.warning(f"host_rate {limiter.rate}/s is below the {needed:.2f}/s that {len(scheduler)} products "
+                            f"need ({per_hour:.0f} requests/hour); polls will fall behind schedule.")
+    changes = ChangeDetector(SNAPSHOT_HOURS, HEARTBEAT_EVERY) if record_mode == "delta" else None
+    # Shop pages are expanded into their products by the catalog task
+    catalogs = {}
+    product_inputs = []
+    for url in urls:
+        shop = parse_shop_url(url)
+        if shop is not None:
+            catalogs.setdefault(shop, ShopCatalog(shop, SHOP_LIST_URL, SHOP_PAGE_SIZE, SHOP_MAX_PAGES))
+        else:
+            product_inputs.append(url)
+    # One schedule entry (hence one fetch and one signature per tick) per product key
+    known = dedupe_urls(product_inputs)
+    explicit = set(known)
+
+    # A checkpoint only resumes the run it was saved for (same products, shops, interval and duration)
+    fingerprint = input_fingerprint(list(explicit) + [f"shop:{shop}" for shop in catalogs], interval_hours, duration_days)
+    checkpoint = StateCheckpoint(MONITOR_STATE_FILE, Actor, fingerprint=fingerprint)
+    saved = await checkpoint.load() if resume else None
+    if saved and saved["end_ts"] > started_at:
+        for shop, data in saved.get("catalogs", {}).items():
+            if shop in catalogs:
+                catalog = catalogs[shop]
+                catalog.product_ids.update(data["product_ids"])
+                catalog.total, catalog.refreshed_at = data.get("total"), data.get("refreshed_at")
+                for product_id in data["product_ids"]:
+                    known.setdefault(f"product:{product_id}", DEFAULT_PRODUCT_URL.format(product_id=product_id))
+        targets = list(known.values())
+        started_at, end_ts = saved["started_at"], saved["end_ts"]
+        schedule = saved.get("schedule", {})
+        stagger = min(RESUME_STAGGER_SECONDS, interval_hours * 3600)
+        for url, due in resume_due_times(targets, schedule, stagger_seconds=stagger).items():
+            scheduler.add(url, due)
+        if policy is not None:
+            policy.restore(saved.get("policy", {}), keys=set(targets))
+        if changes is not None:
+            changes.restore(saved.get("changes", {}))
+        on_time = sum(1 for url in targets if schedule.get(url, 0) > time.time())
+        logging.info(f"Resuming run started {datetime.fromtimestamp(started_at)}: {on_time} products keep their "
+                     f"due times, {len(targets) - on_time} are spread over {stagger:.0f}s.")
+    else:
+        for url in known.values():
+            scheduler.add(url)
+
+    def add_discovered(product_ids):
+        for product_id in product_ids:
+            key = f"product:{product_id}"
+            if key not in known:
+                known[key] = DEFAULT_PRODUCT_URL.format(product_id=product_id)
+                scheduler.add(known[key])
+        fit_host_rate()
+
+    def remove_delisted(catalog, product_ids):
+        for product_id in product_ids:
+            key = f"product:{product_id}"
+            # Still wanted if listed as an input or by another shop
+            if key in explicit or any(product_id in c.product_ids for c in catalogs.values()):
+                continue
+            url = known.pop(key, None)
+            if url is not None:
+                scheduler.remove(url)
+                if policy is not None:
+                    policy.forget(url)
+                if changes is not None:
+                    changes.forget(product_id)
+        fit_host_rate()
+
+    def monitor_state():
+        return {
+            "started_at": started_at,
+            "end_ts": end_ts,
+            "schedule": scheduler.due_times(),
+            "policy": policy.state() if policy is not None else {},
+            "changes": changes.state() if changes is not None else {},
+            "catalogs": {
+                shop: {"product_ids": sorted(c.product_ids), "total": c.total, "refreshed_at": c.refreshed_at}
+                for shop, c in catalogs.items()
+            },
+        }
+
+    fit_host_rate()
+    logging.info(f"Starting fleet monitor for {len(scheduler)} products"
+                 + (f" and {len(catalogs)} shops." if catalogs else "."))
+    logging.info(f"Duration: {duration_days} days. Interval: {interval_hours} hours. "
+                 f"Concurrency: {max_concurrency}. Host rate: {scheduler.rate_limiter.rate:g}/s.")
+
+    breaker = CircuitBreaker("signer", SIGNER_BREAKER_FAILURES, SIGNER_BREAKER_RESET)
+    signer = SignerClient(
+        signer_pool, sessions,
+        signature_ttl=SIGNATURE_CACHE_TTL,
+        identity_ttl=IDENTITY_CACHE_TTL,
+        batch_size=SIGN_BATCH_SIZE,
+        batch_window=SIGN_BATCH_WINDOW,
+        timeout=REQUEST_TIMEOUT,
+        breaker=breaker,
+    )
+
+    parser = ParsePool(PARSE_WORKERS if parse_workers is None else parse_workers)
+    proxies = ProxyPool.from_env(proxy_urls)
+    hedge_percentile = HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+    hedge = HedgePolicy(hedge_percentile) if hedge_percentile else None
+    await parser.warm_up()
+    store = await asyncio.to_thread(open_store)
+    aggregates = await asyncio.to_thread(AggregateBook.load, AGGREGATES_FILE)
+    dataset = dataset or Actor
+    output = DatasetWriter(dataset.push_data, PUSH_BATCH_SIZE, PUSH_FLUSH_INTERVAL, PUSH_QUEUE_SIZE) if dataset else None
+
+    first_sample = None
+
+    async def poll(url):
+        nonlocal first_sample
+        if policy is not None:
+            # Intervals moved with the last observed samples
+            fit_host_rate()
+        current_data = await fetch_product_data_async(url, sessions, signer, parser, proxies, breaker, hedge)
+        if current_data and first_sample is None:
+            first_sample = time.time() - process_start_time()
+            METRICS.observe("startup_seconds", first_sample, phase="first_sample")
+            logging.info(f"First sample {first_sample:.1f}s after process start.")
+        if current_data:
+            await record_sample(current_data, store, aggregates, changes, output)
+        else:
+            logging.warning(f"No data fetched this interval for {url}.")
+        return current_data
+
+    ready = await signer_ready
+    since_start = time.time() - process_start_time()
+    METRICS.observe("startup_seconds", since_start, phase="signer_ready")
+    if ready:
+        logging.info(f"{ready}/{len(signer_pool.endpoints)} signers ready {since_start:.1f}s after process start.")
+    else:
+        logging.warning(f"No signer reported ready within {SIGNER_READY_TIMEOUT:.0f}s; polling anyway.")
+    logging.info(f"Signer pool: {[e.url for e in signer_pool.endpoints]}")
+    logging.info(f"Proxy pool: {[e.name for e in proxies.endpoints] or 'direct'}")
+    signer_pool.start()
+    flush_task = asyncio.create_task(flush_store_periodically(store)) if store is not None else None
+    checkpoint_task = asyncio.create_task(checkpoint_aggregates_periodically(aggregates))
+    state_task = asyncio.create_task(save_state_periodically(checkpoint, monitor_state))
+
+    async def on_migrating(event_data=None):
+        # The platform is about to move the run; save now instead of waiting for the next checkpoint
+        await checkpoint.save(monitor_state())
+
+    if Actor and Event is not None:
+        Actor.on(Event.MIGRATING, on_migrating)
+    proxy_stats_task = asyncio.create_task(log_proxy_stats_periodically(proxies)) if len(proxies) else None
+    catalog_task = None
+    if catalogs:
+        async def fetch_listing(page_url):
+            return await fetch_listing_page_async(page_url, sessions, signer, proxies, breaker)
+
+        catalog_task = asyncio.create_task(
+            refresh_catalogs_periodically(list(catalogs.values()), fetch_listing, add_discovered, remove_delisted)
+        )
+
+    METRICS.collectors.update({
+        "proxies": proxies.stats,
+        "signers": signer_pool.stats,
+        "signer_circuit": lambda: breaker.state,
+        "scheduled": lambda: len(scheduler),
+        "catalogs": lambda: [c.stats() for c in catalogs.values()],
+        "push_queue": lambda: output.pending if output is not None else 0,
+    })
+    metrics_port = METRICS_PORT if metrics_port is None else metrics_port
+    metrics_server = None
+    if metrics_port:
+        try:
+            metrics_server = await serve_metrics(metrics_port)
+        except OSError as e:
+            logging.warning(f"Could not start metrics endpoint on port {metrics_port}: {e}")
+    metrics_task = asyncio.create_task(write_metrics_periodically()) if METRICS_FILE else None
+
+    try:
+        await scheduler.run(poll, end_ts)
+    except asyncio.CancelledError:
+        logging.info("Monitoring cancelled.")
+    except KeyboardInterrupt:
+        logging.info("Monitoring stopped manually.")
+    finally:
+        if catalog_task is not None:
+            catalog_task.cancel()
+        state_task.cancel()
+        if Actor and Event is not None:
+            Actor.off(Event.MIGRATING, on_migrating)
+        await checkpoint.save(monitor_state())
+        if output is not None:
+            await output.close()
+        checkpoint_task.cancel()
+        await checkpoint_aggregates(aggregates)
+        if proxy_stats_task is not None:
+            proxy_stats_task.cancel()
+            proxies.log_stats()
+        if metrics_task is not None:
+            metrics_task.cancel()
+            await write_metrics()
+        if metrics_server is not None:
+            metrics_server.close()
+        if flush_task is not None:
+            flush_task.cancel()
+        if store is not None:
+            store.close()
+        await signer_pool.stop()
+        await sessions.close()
+        parser.close()
+        logging.info(f"Retries: signing {SIGN_RETRY.retries} ({SIGN_RETRY.exhausted} exhausted), "
+                     f"fetch {FETCH_RETRY.retries} ({FETCH_RETRY.exhausted} exhausted). "
+                     f"Signer circuit opened {breaker.opened} times."
+                     + (f" Hedged {hedge.hedged} fetches ({hedge.hedge_wins} won by the hedge)." if hedge else ""))
+        RAW_ARCHIVE.close()
+
+    logging.info("Monitoring finished.")
+
+def parse_start_urls(start_urls):
+    """
+    Normalizes Apify `startUrls` (list of {"url": ...} dicts or plain strings) to a list of URLs.
+    """
+    urls = []
+    for entry in start_urls or []:
+        if isinstance(entry, dict):
+            entry = entry.get("url")
+        if isinstance(entry, str) and entry.strip():
+            urls.append(entry.strip())
+    return urls
+
+def redacted_input(actor_input):
+    """
+    actor_input for logging, with credentials stripped from proxy_urls.
+    """
+    if not actor_input.get("proxy_urls"):
+        return actor_input
+    return dict(actor_input, proxy_urls=[redact_url(url) for url in parse_start_urls(actor_input["proxy_urls"])])
+
 async def main():
-    target_url = None
+    target_urls = []
     duration_days = 7
     interval_hours = 1
+    max_concurrency = 20
+    host_rate = None
+    signer_urls = None
+    adaptive_options = {}
+    record_mode = "delta"
+    parse_workers = None
+    proxy_urls = None
+    hedge_percentile = None
+    metrics_port = None
+    resume = True
 
     if Actor:
         logging.info("Running in Apify Actor environment.")
@@ -281,39 +845,55 @@ async def main():
         
         # Get input
         actor_input = await Actor.get_input() or {}
-        logging.info(f"Received input: {actor_input}")
+        logging.info(f"Received input: {redacted_input(actor_input)}")
         
         # Parse input
         if "startUrls" in actor_input:
-            start_urls = actor_input.get("startUrls", [])
-            if start_urls and len(start_urls) > 0:
-                # Check structure
-                first_url = start_urls[0]
-                if isinstance(first_url, dict):
-                    target_url = first_url.get("url")
-                elif isinstance(first_url, str):
-                    target_url = first_url
+            target_urls = parse_start_urls(actor_input.get("startUrls", []))
         
-        if not target_url and "url" in actor_input:
-             target_url = actor_input.get("url")
+        if not target_urls and "url" in actor_input:
+             target_urls = parse_start_urls([actor_input.get("url")])
 
         # Check command line args if input didn't provide URL (useful for local testing with Actor lib installed)
-        if not target_url and len(sys.argv) > 1:
-            target_url = sys.argv[1]
+        if not target_urls and len(sys.argv) > 1:
+            target_urls = parse_start_urls(sys.argv[1:])
              
         # Override duration/interval if provided
         if "duration_days" in actor_input:
             duration_days = int(actor_input.get("duration_days"))
         if "interval_hours" in actor_input:
             interval_hours = float(actor_input.get("interval_hours"))
+        if "max_concurrency" in actor_input:
+            max_concurrency = int(actor_input.get("max_concurrency"))
+        if "host_rate" in actor_input:
+            host_rate = float(actor_input.get("host_rate"))
+        if "signer_urls" in actor_input:
+            signer_urls = parse_start_urls(actor_input.get("signer_urls"))
+        if "parse_workers" in actor_input:
+            parse_workers = int(actor_input.get("parse_workers"))
+        if "proxy_urls" in actor_input:
+            proxy_urls = parse_start_urls(actor_input.get("proxy_urls"))
+        if "hedge_percentile" in actor_input:
+            hedge_percentile = float(actor_input.get("hedge_percentile"))
+        if "metrics_port" in actor_input:
+            metrics_port = int(actor_input.get("metrics_port"))
+        if "resume" in actor_input:
+            resume = bool(actor_input.get("resume"))
+        if "record_mode" in actor_input:
+            record_mode = actor_input.get("record_mode")
+        if actor_input.get("adaptive"):
+            adaptive_options["adaptive"] = True
+            for key in ("min_interval_hours", "max_interval_hours", "request_budget"):
+                if key in actor_input:
+                    adaptive_options[key] = float(actor_input.get(key))
 
     else:
         logging.info("Running in standalone environment.")
         # Command line args fallback
         if len(sys.argv) > 1:
-            target_url = sys.argv[1]
+            target_urls = parse_start_urls(sys.argv[1:])
 
-    if not target_url:
+    if not target_urls:
         logging.error("No target URL provided via input or arguments.")
         if Actor:
             await Actor.fail(status_message="No target URL provided.")
@@ -321,7 +901,10 @@ async def main():
         sys.exit(1)
 
     # Run monitoring
-    await monitor_product(target_url, duration_days, interval_hours)
+    await monitor_fleet(target_urls, duration_days, interval_hours, max_concurrency, host_rate, signer_urls,
+                        record_mode=record_mode, parse_workers=parse_workers, proxy_urls=proxy_urls,
+                        hedge_percentile=hedge_percentile, metrics_port=metrics_port, resume=resume,
+                        **adaptive_options)
     
     if Actor:
         await Actor.exit()
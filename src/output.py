@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import time
+
+from metrics import METRICS
+
+# Queued by close() so a partially filled batch is pushed without waiting out flush_interval
+_FLUSH = object()
+
+
+class DatasetWriter:
+    """
+    Bounded output queue in front of a dataset's `push_data`.
+
+    `put()` enqueues a record and only waits when the queue is full, which is the
+    backpressure signal to the polling loop. A writer task pushes records in
+    batches of up to `max_batch`, or whatever has accumulated after
+    `flush_interval` seconds. `close()` drains the queue before returning, so it
+    must be awaited before `Actor.exit()`.
+    """
+
+    def __init__(self, push, max_batch=100, flush_interval=5.0, max_queue=1000, max_retries=3):
+        self.push = push
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.pushed = 0
+        self.batches = 0
+        self.failed = 0
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, record):
+        if self._task is None:
+            self.start()
+        await self._queue.put(record)
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    async def _next_batch(self):
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch:
+            if deadline is None:
+                item = await self._queue.get()
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _FLUSH:
+                self._queue.task_done()
+                break
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    async def _push(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with METRICS.timer("push"):
+                    await self.push(batch)
+                self.pushed += len(batch)
+                self.batches += 1
+                METRICS.inc("pushed_records_total", len(batch))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    METRICS.inc("failures_total", len(batch), stage="push")
+                    logging.error(f"Dropping {len(batch)} records after {attempt + 1} failed pushes: {e}")
+                    return
+                logging.warning(f"Dataset push failed ({e}); retrying.")
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            try:
+                await self._push(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def close(self):
+        """Pushes everything still queued, then stops the writer task."""
+        if self._task is None:
+            return
+        await self._queue.put(_FLUSH)
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logging.info(f"Dataset writer pushed {self.pushed} records in {self.batches} batches "
+                     f"({self.failed} dropped).")
+
+
+class LocalDataset:
+    """
+    Offline stand-in for the Apify dataset API: `push_data` appends records to a
+    JSONL file (or keeps them in memory when path is None), with an optional
+    simulated latency per call.
+    """
+
+    def __init__(self, path=None, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self.items = []
+        self.calls = 0
+
+    async def push_data(self, data):
+        items = data if isinstance(data, list) else [data]
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.path is None:
+            self.items.extend(items)
+            return
+        lines = "".join(json.dumps(item) + "\n" for item in items)
+        await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines):
+        with open(self.path, "a") as f:
+            f.write(lines)
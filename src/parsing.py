@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import os
+import reprlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from extractor import JSON_ERRORS, find_hydration_json, loads
+from metrics import METRICS
+from products import fill_product_ids
+from store import to_number
+
+# Bounded repr: str() of a multi-MB response only to keep 200 chars dominated JSON parsing time
+_SNIPPET_REPR = reprlib.Repr()
+_SNIPPET_REPR.maxlevel = 3
+_SNIPPET_REPR.maxdict = 8
+_SNIPPET_REPR.maxlist = 8
+_SNIPPET_REPR.maxstring = 120
+_SNIPPET_REPR.maxother = 120
+
+def response_snippet(json_data, limit=200):
+    """
+    First `limit` characters of a truncated repr of the response.
+    """
+    return _SNIPPET_REPR.repr(json_data)[:limit]
+
+def extract_skus(item):
+    """
+    Per-SKU stock/price/sold from a product's `stock_infos` (or `skus` / `sku_list`),
+    as compact dicts. Empty list when the payload has no SKU breakdown.
+    """
+    entries = item.get("stock_infos") or item.get("skus") or item.get("sku_list") or []
+    skus = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        sku_id = entry.get("sku_id") or entry.get("id")
+        if sku_id is None:
+            continue
+        stock = entry.get("stock")
+        if stock is None:
+            stock = entry.get("available_stock", entry.get("stock_num"))
+        skus.append({
+            "sku_id": str(sku_id),
+            "stock": to_number(stock),
+            "price": to_number(entry.get("price")),
+            "sold": to_number(entry.get("sold_count")),
+        })
+    return skus
+
+def _total_stock(stock, skus):
+    # Item-level stock is often missing; the real figure is the sum over SKUs
+    if stock or not skus:
+        return stock
+    return sum(sku["stock"] for sku in skus if sku["stock"] is not None)
+
+def parse_html_for_data(html_content, product_url, stats=None):
+    """
+    Parses HTML content to find embedded JSON data (SIGI_STATE, __UNIVERSAL_DATA, etc.).
+    Accepts the raw response bytes (preferred, avoids decoding the whole page) or a str.
+    A `stats` dict receives the decode time, the pattern that matched and the
+    product path (ItemModule / ProductDetail / __DEFAULT_SCOPE__) that was used.
+    """
+    logging.info("Parsing HTML for embedded data...")
+    
+    started = time.perf_counter()
+    json_data, pattern_name = find_hydration_json(html_content)
+    if stats is not None:
+        stats["decode"] = time.perf_counter() - started
+        stats["path"] = pattern_name or "none"
+    if json_data is not None:
+        logging.info(f"Found JSON data using pattern: {pattern_name}")
+                
+    if not json_data:
+        logging.warning("No JSON data found in HTML.")
+        # Attempt fallback: Look for "ItemModule" or similar direct structures if full hydration failed
+        return None
+
+    # Extraction Logic
+    # The structure varies. We need to find the Product info.
+    try:
+        # Common paths in SIGI_STATE / Universal Data
+        # 1. ItemModule -> <id>
+        # 2. ProductDetail -> ...
+        # 3. 'webapp.video-detail' -> ...
+        
+        product_info = {}
+        
+        # Helper to find product data in nested dicts
+        # We look for "stock" and "price" keys
+        
+        # Strategy: Flatten or search? 
+        # Let's try known paths first.
+        
+        item_data = None
+        
+        item_path = None
+        
+        if "ItemModule" in json_data:
+            # Usually keyed by video ID or product ID
+            for key, val in json_data["ItemModule"].items():
+                if val and ("price" in val or "stock" in val):
+                    item_data = val
+                    item_path = "ItemModule"
+                    break
+                    
+        if not item_data and "ProductDetail" in json_data:
+             item_data = json_data.get("ProductDetail")
+             item_path = "ProductDetail"
+
+        # Universal Data structure (e.g. from __UNIVERSAL_DATA__)
+        if not item_data and "__DEFAULT_SCOPE__" in json_data:
+             scope = json_data["__DEFAULT_SCOPE__"]
+             if "webapp.product-detail" in scope:
+                 item_data = scope["webapp.product-detail"].get("productInfo")
+                 item_path = "__DEFAULT_SCOPE__"
+        
+        if stats is not None:
+            stats["item_path"] = item_path if item_data else "none"
+        if item_data:
+            skus = extract_skus(item_data)
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "url": product_url,
+                "product_id": item_data.get("id") or item_data.get("product_id") or "unknown",
+                "title": item_data.get("title") or item_data.get("name"),
+                "total_stock": _total_stock(item_data.get("stock", 0) or item_data.get("quantity", 0), skus),
+                "total_sold": item_data.get("sold_count", 0) or item_data.get("sales", 0),
+                "price": item_data.get("price", {}).get("min_price") or item_data.get("price", 0),
+                "currency": item_data.get("price", {}).get("currency") or "USD",
+                "status": "active" if item_data.get("status") == 1 else "inactive",
+                "skus": skus,
+                "raw_response_snippet": "HTML Parsing Success"
+            }
+            
+        logging.warning("JSON found but could not locate specific Product Info inside.")
+        return None
+
+    except Exception as e:
+        logging.error(f"Error extracting data from JSON: {e}")
+        return None
+
+def extract_product_info(json_data, product_url):
+    try:
+        product_data = json_data.get("data", {})
+        if not product_data:
+            logging.warning("No 'data' field in JSON response.")
+            return None
+
+        item = product_data.get("product_info", {})
+        skus = extract_skus(item)
+        
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "url": product_url,
+            "product_id": item.get("product_id", "unknown"),
+            "total_stock": _total_stock(item.get("stock", 0), skus),
+            "total_sold": item.get("sold_count", 0),
+            "price": item.get("price", {}).get("min_price", 0),
+            "skus": skus,
+            "raw_response_snippet": response_snippet(json_data)
+        }
+    except Exception as e:
+        logging.error(f"Error extracting product info: {e}")
+        return None
+
+def parse_response(content, content_type, product_url, stats=None):
+    """
+    Dispatches a raw response body to the JSON or HTML extractor based on its content type.
+    A `stats` dict receives decode/extract timings and the extraction path taken.
+    """
+    if "application/json" in content_type:
+        try:
+            started = time.perf_counter()
+            data = loads(content)
+            if stats is not None:
+                stats["decode"] = time.perf_counter() - started
+                stats["path"] = "json_api"
+                stats["item_path"] = "data.product_info"
+            return extract_product_info(data, product_url)
+        except JSON_ERRORS:
+            logging.error("Failed to decode JSON response.")
+            return None
+    elif "text/html" in content_type:
+        # The extractor scans the raw bytes; only the JSON payload is ever decoded
+        try:
+            return parse_html_for_data(content, product_url, stats)
+        except Exception as e:
+            logging.error(f"Error processing HTML: {e}")
+            return None
+    else:
+        logging.warning(f"Response content type is {content_type}. Might be Protobuf.")
+        if stats is not None:
+            stats["path"] = "unsupported"
+        return None
+
+def parse_timed(content, content_type, product_url):
+    """
+    parse_response plus its stage timings, as (result, stats). Runs in parse workers,
+    so the timings travel back with the result instead of through shared state.
+    A product_id the page did not yield is taken from the URL.
+    """
+    stats = {"path": "none"}
+    started = time.perf_counter()
+    result = fill_product_ids(parse_response(content, content_type, product_url, stats), product_url)
+    stats["extract"] = time.perf_counter() - started - stats.get("decode", 0.0)
+    return result, stats
+
+def record_parse_stats(stats, result):
+    if "decode" in stats:
+        METRICS.observe_stage("decode", stats["decode"])
+    METRICS.observe_stage("extract", stats["extract"])
+    METRICS.inc("extraction_total", path=stats["path"])
+    if result is None:
+        METRICS.inc("failures_total", stage="parse")
+
+
+# Cap on the default worker count: container CPU quotas are often far below the visible cores
+MAX_DEFAULT_WORKERS = 4
+
+
+def default_workers():
+    """Usable cores minus one for the event loop, capped at MAX_DEFAULT_WORKERS."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(0, min(cores - 1, MAX_DEFAULT_WORKERS))
+
+
+class ParsePool:
+    """
+    Runs parse_response on a ProcessPoolExecutor so JSON decoding and extraction of
+    multi-MB pages scale across cores while the event loop keeps doing I/O.
+
+    Only the raw body bytes go to a worker and only the small result dict comes
+    back. workers=0 parses inline on the calling thread. When a worker dies the
+    pool is replaced, so one crash does not turn the rest of the run inline.
+    """
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = default_workers()
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.restarts = 0
+
+    def _replace(self, broken):
+        # Several parses fail together when a worker dies; only the first replaces the pool
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.restarts += 1
+
+    async def parse(self, content, content_type, product_url):
+        """Parses in a worker (or inline) and records decode/extract timings and the extraction path."""
+        if self._executor is None:
+            result, stats = parse_timed(content, content_type, product_url)
+        else:
+            loop = asyncio.get_running_loop()
+            executor = self._executor
+            try:
+                result, stats = await loop.run_in_executor(
+                    executor, parse_timed, content, content_type, product_url
+                )
+            except BrokenProcessPool as e:
+                logging.error(f"Parse worker died ({e}); parsing inline and restarting the pool.")
+                self._replace(executor)
+                result, stats = parse_timed(content, content_type, product_url)
+        record_parse_stats(stats, result)
+        return result
+
+    async def warm_up(self):
+        """Starts the worker processes now instead of on the first parse."""
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self._executor, os.getpid) for _ in range(self.workers)))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
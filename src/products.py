@@ -0,0 +1,113 @@
+import logging
+import re
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+ProductKey = namedtuple("ProductKey", ["product_id", "shop"])
+
+DEFAULT_PRODUCT_URL = "https://www.tiktok.com/view/product/{product_id}"
+
+# /@shop/product/<id>, /view/product/<id>, /shop/pdp/<slug>/<id>, /api/product/<id>, ...
+_PATH_ID = re.compile(r"/(?:product|pdp(?:/[^/]+)?)/(\d{6,})")
+_SHOP_HANDLE = re.compile(r"/@([^/?#]+)")
+_BARE_ID = re.compile(r"^\d{6,}$")
+# /shop/store/<slug>/<seller id>
+_STORE_PATH = re.compile(r"/shop/store/(?:[^/]+/)?(\d{6,})")
+_ID_PARAMS = ("product_id", "productId", "item_id")
+_SHOP_PARAMS = ("shop_id", "seller_id", "shopId", "sellerId")
+
+# Share/tracking parameters that change between copies of the same link
+_TRACKING_PARAMS = {
+    "_r", "_t", "_svg", "checksum", "enter_from", "enter_method", "is_copy_url", "is_from_webapp",
+    "refer", "sec_uid", "sec_user_id", "sender_device", "sender_web_id", "share_app_id", "share_link_id",
+    "share_item_id", "share_region", "social_share_type", "source", "timestamp", "trackParams",
+    "tt_from", "u_code", "user_id", "web_id",
+}
+
+
+def parse_product_url(url):
+    """
+    ProductKey(product_id, shop) for a product URL or bare numeric id, or None when
+    no product id can be found (e.g. vm.tiktok.com short links). `shop` is the
+    @handle or shop/seller id when the URL carries one.
+    """
+    url = url.strip()
+    if _BARE_ID.match(url):
+        return ProductKey(url, None)
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query))
+    match = _PATH_ID.search(parsed.path)
+    product_id = match.group(1) if match else next((query[p] for p in _ID_PARAMS if query.get(p)), None)
+    if product_id is None:
+        return None
+    handle = _SHOP_HANDLE.search(parsed.path)
+    shop = handle.group(1) if handle else next((query[p] for p in _SHOP_PARAMS if query.get(p)), None)
+    return ProductKey(product_id, shop)
+
+
+def parse_shop_url(url):
+    """
+    Shop handle (without the @) or seller id when url is a shop page rather than a
+    product page (https://www.tiktok.com/@shop, /shop/store/<slug>/<id>, ?seller_id=...), else None.
+    """
+    if parse_product_url(url) is not None:
+        return None
+    parsed = urlparse(url.strip())
+    store = _STORE_PATH.search(parsed.path)
+    if store:
+        return store.group(1)
+    handle = _SHOP_HANDLE.search(parsed.path)
+    if handle and parsed.path.rstrip("/").count("/") == 1:
+        return handle.group(1)
+    query = dict(parse_qsl(parsed.query))
+    return next((query[p] for p in _SHOP_PARAMS if query.get(p)), None)
+
+
+def strip_tracking(url):
+    """url without share/tracking parameters (utm_*, share_*, ...) and fragment."""
+    parsed = urlparse(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+             if k not in _TRACKING_PARAMS and not k.startswith(("utm_", "share_"))]
+    return urlunparse(parsed._replace(query=urlencode(query), fragment=""))
+
+
+def product_key(url):
+    """Scheduling/dedup key: "product:<id>" when the id is known, else the URL without tracking parameters."""
+    key = parse_product_url(url)
+    return f"product:{key.product_id}" if key is not None else strip_tracking(url)
+
+
+def dedupe_urls(urls):
+    """
+    Collapses inputs that name the same product into one fetch URL per product,
+    keeping the first form seen (minus tracking parameters). Bare ids become
+    DEFAULT_PRODUCT_URL. Returns {key: fetch_url} in input order.
+    """
+    targets = {}
+    duplicates = 0
+    for url in urls:
+        key = product_key(url)
+        if key in targets:
+            duplicates += 1
+            continue
+        if _BARE_ID.match(url.strip()):
+            targets[key] = DEFAULT_PRODUCT_URL.format(product_id=url.strip())
+        else:
+            targets[key] = strip_tracking(url)
+    if duplicates:
+        logging.info(f"Merged {duplicates} duplicate inputs; {len(targets)} distinct products.")
+    return targets
+
+
+def fill_product_ids(result, url):
+    """Fills product_id (and shop) from the URL when extraction could not find them."""
+    if result is None:
+        return result
+    key = parse_product_url(url or "")
+    if key is None:
+        return result
+    if result.get("product_id") in (None, "", "unknown"):
+        result["product_id"] = key.product_id
+    if key.shop and not result.get("shop"):
+        result["shop"] = key.shop
+    return result
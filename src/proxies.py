@@ -0,0 +1,183 @@
+import logging
+import os
+import random
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+# Statuses that mean the exit node is blocked or throttled rather than the product missing
+BLOCK_STATUSES = (403, 429)
+
+
+def is_proxy_failure(status):
+    """
+    Whether a fetch outcome counts against the exit node: no response at all
+    (`status` None: connection error or timeout), a block, or a 5xx. A 404 or other
+    4xx is about the product, not the proxy.
+    """
+    return status is None or status in BLOCK_STATUSES or status >= 500
+
+
+def redact_url(url):
+    """Proxy URL without credentials, for logs and stats."""
+    parsed = urlparse(url)
+    if parsed.password or parsed.username:
+        return parsed._replace(netloc=parsed.hostname + (f":{parsed.port}" if parsed.port else "")).geturl()
+    return url
+
+
+class ProxyEndpoint:
+    """One exit node and its latency/error state."""
+
+    def __init__(self, url, window=200):
+        self.url = url
+        self.name = redact_url(url)
+        self.proxies = {"http": url, "https": url}
+        self.latency = None
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.blocks = 0
+        self.recent = deque(maxlen=window)
+
+    def available(self, now):
+        return self.cooldown_until <= now
+
+    def weight(self, default_latency):
+        latency = self.latency if self.latency is not None else default_latency
+        return max(0.05, 1.0 - self.error_rate) / max(latency, 0.01)
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    def __repr__(self):
+        return f"ProxyEndpoint({self.name}, latency={self.latency}, error_rate={self.error_rate:.2f})"
+
+
+class ProxyPool:
+    """
+    Rotating pool of exit nodes for product fetches.
+
+    Each proxy tracks an EWMA of its fetch latency and error rate. A product sticks
+    to the proxy it was assigned until that proxy errors or is cooled down; new
+    assignments pick randomly among the `top_k` healthy proxies, weighted by
+    (1 - error_rate) / latency. A 403/429 puts the proxy in cooldown for
+    `cooldown_seconds` and reassigns its products.
+    """
+
+    def __init__(self, urls, alpha=0.2, cooldown_seconds=300, top_k=3, sticky=True):
+        self.endpoints = [ProxyEndpoint(url) for url in dict.fromkeys(urls)]
+        self.alpha = alpha
+        self.cooldown_seconds = cooldown_seconds
+        self.top_k = max(1, int(top_k))
+        self.sticky = sticky
+        self._assigned = {}
+
+    @classmethod
+    def from_env(cls, urls=None):
+        """
+        Pool from `urls`, else PROXY_URLS (comma-separated), else the legacy
+        HTTP_PROXY/HTTPS_PROXY pair as a single proxy.
+        """
+        if not urls:
+            urls = [u.strip() for u in os.environ.get("PROXY_URLS", "").split(",") if u.strip()]
+        if not urls:
+            legacy = os.environ.get("HTTPS_PROXY") or os.environ.get("HTTP_PROXY")
+            urls = [legacy] if legacy else []
+        return cls(urls,
+                   cooldown_seconds=float(os.environ.get("PROXY_COOLDOWN_SECONDS", 300)),
+                   top_k=int(os.environ.get("PROXY_TOP_K", 3)))
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def _pick(self, candidates):
+        known = [e.latency for e in candidates if e.latency is not None]
+        # Untried proxies are scored at the pool's median so they still get traffic
+        default_latency = sorted(known)[len(known) // 2] if known else 1.0
+        ranked = sorted(candidates, key=lambda e: e.weight(default_latency), reverse=True)[:self.top_k]
+        return random.choices(ranked, weights=[e.weight(default_latency) for e in ranked])[0]
+
+    def acquire(self, key=None, exclude=()):
+        """
+        Proxy for one request on behalf of `key` (the product URL), or None when the
+        pool is empty (direct connection). `exclude` skips proxies already carrying
+        this product's in-flight request (hedging) without changing its assignment.
+        """
+        if not self.endpoints:
+            return None
+        now = time.monotonic()
+        assigned = self._assigned.get(key) if self.sticky else None
+        endpoint = assigned
+        if endpoint is None or not endpoint.available(now) or endpoint in exclude:
+            candidates = [e for e in self.endpoints if e.available(now) and e not in exclude]
+            if candidates:
+                endpoint = self._pick(candidates)
+            else:
+                # Everything is cooling down: use the one that recovers first rather than going direct
+                endpoint = min(self.endpoints, key=lambda e: e.cooldown_until)
+            if self.sticky and key is not None and (assigned is None or assigned not in exclude):
+                self._assigned[key] = endpoint
+        endpoint.outstanding += 1
+        return endpoint
+
+    def release(self, endpoint, latency=None, status=None, ok=True, key=None):
+        """
+        Records the outcome of a request: `latency` in seconds (when a response
+        arrived), the HTTP `status`, and whether the exit node delivered a good response.
+        """
+        if endpoint is None:
+            return
+        endpoint.outstanding -= 1
+        endpoint.requests += 1
+        if latency is not None:
+            endpoint.recent.append(latency)
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += self.alpha * (latency - endpoint.latency)
+        endpoint.error_rate += self.alpha * ((0.0 if ok else 1.0) - endpoint.error_rate)
+        if ok:
+            return
+
+        endpoint.failures += 1
+        if key is not None and self._assigned.get(key) is endpoint:
+            # Let the product try a different exit next time
+            del self._assigned[key]
+        if status in BLOCK_STATUSES:
+            endpoint.blocks += 1
+            endpoint.cooldown_until = time.monotonic() + self.cooldown_seconds
+            for assigned_key in [k for k, e in self._assigned.items() if e is endpoint]:
+                del self._assigned[assigned_key]
+            logging.warning(f"Proxy {endpoint.name} got HTTP {status}; cooling down for {self.cooldown_seconds}s.")
+
+    def abandon(self, endpoint):
+        """Drops a request that was cancelled (e.g. a losing hedge) without scoring it."""
+        if endpoint is not None:
+            endpoint.outstanding -= 1
+
+    def stats(self):
+        now = time.monotonic()
+        return [
+            {"proxy": e.name,
+             "latency_ewma": round(e.latency, 3) if e.latency is not None else None,
+             "latency_p50": e.percentile(0.50),
+             "latency_p95": e.percentile(0.95),
+             "error_rate": round(e.error_rate, 3),
+             "requests": e.requests,
+             "failures": e.failures,
+             "blocks": e.blocks,
+             "outstanding": e.outstanding,
+             "cooling_down": not e.available(now),
+             "assigned": sum(1 for a in self._assigned.values() if a is e)}
+            for e in self.endpoints
+        ]
+
+    def log_stats(self):
+        for row in sorted(self.stats(), key=lambda r: r["latency_p95"] or 0, reverse=True):
+            logging.info(f"Proxy stats: {row}")
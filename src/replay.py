@@ -0,0 +1,180 @@
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from archive import decompress, iter_index
+from parsing import parse_timed
+from store import SampleStore
+
+
+def _quiet_worker():
+    # Per-page INFO/WARNING lines would dominate a replay of millions of pages
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def replay_chunk(directory, entries):
+    """
+    Re-extracts one chunk of archived responses. Runs in a worker: it reads and
+    decompresses the frames itself, so only index entries and results cross processes.
+    Returns [(entry, result, stats, raw_length)].
+    """
+    out = []
+    handles = {}
+    try:
+        for entry in entries:
+            try:
+                segment = entry["segment"]
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = open(os.path.join(directory, segment), "rb")
+                f.seek(entry["offset"])
+                body = decompress(f.read(entry["length"]), entry.get("compression", "gzip"))
+            except Exception as e:
+                out.append((entry, None, {"path": "unreadable", "item_path": "none", "error": str(e)}, 0))
+                continue
+            result, stats = parse_timed(body, entry.get("content_type") or "", entry.get("url"))
+            if result is not None:
+                # The sample belongs to the original fetch, not to the replay
+                result["timestamp"] = entry["timestamp"]
+                result["replayed"] = True
+            out.append((entry, result, stats, len(body)))
+    finally:
+        for f in handles.values():
+            f.close()
+    return out
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bounded_map(executor, func, directory, chunks, window):
+    """Like executor.map, but keeps at most `window` chunks in flight instead of queueing the whole index."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(func, directory, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class ReplayReport:
+    """Hit counts per extraction path and throughput for one replay run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = 0
+        self.extracted = 0
+        self.fixed = 0
+        self.lost = 0
+        self.raw_bytes = 0
+        self.paths = Counter()
+        self.item_paths = Counter()
+
+    def add(self, entry, result, stats, raw_length):
+        self.records += 1
+        self.raw_bytes += raw_length
+        self.paths[stats.get("path", "none")] += 1
+        self.item_paths[stats.get("item_path", "none")] += 1
+        if result is not None:
+            self.extracted += 1
+            if not entry.get("extracted"):
+                self.fixed += 1
+        elif entry.get("extracted"):
+            self.lost += 1
+
+    def lines(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        lines = [
+            f"Replayed {self.records} responses in {elapsed:.1f}s "
+            f"({self.records / elapsed:.0f} pages/s, {self.raw_bytes / 1048576 / elapsed:.1f} MB/s raw).",
+            f"Extracted {self.extracted}/{self.records} "
+            f"({self.fixed} newly extracted, {self.lost} no longer extracted).",
+        ]
+        for title, counter in (("Hydration path", self.paths), ("Product path", self.item_paths)):
+            for path, count in counter.most_common():
+                lines.append(f"  {title:<15} {path:<45} {count:>9} {count / max(self.records, 1):7.1%}")
+        return lines
+
+
+def replay(directory, store=None, out=None, workers=None, chunk_size=256, dry_run=False, **filters):
+    """
+    Streams archived responses (iter_index filters) through the extractors on
+    `workers` processes (0 = inline) and upserts the re-extracted samples into
+    `store` and/or appends them to the JSONL file `out`. Returns a ReplayReport.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    report = ReplayReport()
+    chunks = _chunks(iter_index(directory, **filters), chunk_size)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_quiet_worker) if workers > 0 else None
+    out_file = open(out, "a") if out and not dry_run else None
+    try:
+        if executor is not None:
+            results = _bounded_map(executor, replay_chunk, directory, chunks, workers * 2)
+        else:
+            results = (replay_chunk(directory, chunk) for chunk in chunks)
+        for chunk in results:
+            samples = []
+            for entry, result, stats, raw_length in chunk:
+                report.add(entry, result, stats, raw_length)
+                if result is not None:
+                    samples.append(result)
+            if dry_run or not samples:
+                continue
+            if store is not None:
+                store.upsert(samples)
+            if out_file is not None:
+                out_file.write("".join(json.dumps(sample) + "\n" for sample in samples))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if out_file is not None:
+            out_file.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract archived raw responses offline and upsert the samples.")
+    parser.add_argument("--archive", default=os.environ.get("RAW_ARCHIVE_DIR", "raw_archive"))
+    parser.add_argument("--db", default=os.environ.get("MONITOR_DB_FILE", "monitor.db"),
+                        help="Sample store to upsert into ('' to skip)")
+    parser.add_argument("--out", help="Also append re-extracted samples to this JSONL file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, 0 = inline)")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--product-id")
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    parser.add_argument("--failures-only", action="store_true", help="Only responses that failed extraction")
+    parser.add_argument("--dry-run", action="store_true", help="Report hit rates without writing anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    _quiet_worker()
+    store = None
+    if args.db and not args.dry_run:
+        store = SampleStore(args.db)
+    try:
+        report = replay(args.archive, store, args.out, args.workers, args.chunk_size, args.dry_run,
+                        product_id=args.product_id, since=args.since, until=args.until,
+                        failures_only=args.failures_only)
+    finally:
+        if store is not None:
+            store.close()
+    for line in report.lines():
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
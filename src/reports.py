@@ -0,0 +1,244 @@
+import argparse
+import csv
+import logging
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from changes import expand_records
+from store import SampleStore, read_jsonl, to_epoch
+
+# Parquet output is optional
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+BUCKET_SECONDS = {"hour": 3600, "day": 86400}
+BUCKET_NAMES = {"hour": "hourly", "day": "daily"}
+
+
+class SampleArrays:
+    """
+    Monitor history as parallel NumPy columns, sorted by (product_id, ts).
+    `starts` holds the row index where each product's group begins.
+    """
+
+    def __init__(self, product_ids, ts, total_sold, total_stock, price):
+        self.product_ids = np.asarray(product_ids, dtype=object)
+        self.ts = np.asarray(ts, dtype=np.float64)
+        self.total_sold = np.asarray(total_sold, dtype=np.float64)
+        self.total_stock = np.asarray(total_stock, dtype=np.float64)
+        self.price = np.asarray(price, dtype=np.float64)
+        if len(self.ts):
+            changed = np.flatnonzero(self.product_ids[1:] != self.product_ids[:-1]) + 1
+            self.starts = np.concatenate(([0], changed))
+        else:
+            self.starts = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Rows of (product_id, ts, total_sold, total_stock, price), already ordered by product and time."""
+        if not rows:
+            return cls([], [], [], [], [])
+        product_ids, ts, sold, stock, price = zip(*rows)
+        # None (missing field) becomes NaN
+        return cls(
+            product_ids,
+            ts,
+            np.array(sold, dtype=np.float64),
+            np.array(stock, dtype=np.float64),
+            np.array(price, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_store(cls, store, since=None, until=None):
+        return cls.from_rows(store.range(since, until))
+
+    @classmethod
+    def from_jsonl(cls, path):
+        """Reads a monitor log; snapshot/delta/heartbeat records are expanded into full samples first."""
+        rows = []
+        for s in expand_records(read_jsonl(path)):
+            try:
+                rows.append((str(s.get("product_id") or "unknown"), to_epoch(s["timestamp"]),
+                             s.get("total_sold"), s.get("total_stock"), s.get("price")))
+            except (KeyError, ValueError):
+                continue
+        rows.sort(key=lambda r: (r[0], r[1]))
+        return cls.from_rows(rows)
+
+    def group_index(self):
+        """Row index of the first row of each row's product group."""
+        lengths = np.diff(np.concatenate((self.starts, [len(self.ts)])))
+        return np.repeat(self.starts, lengths)
+
+
+def compute_intervals(samples, max_gap_hours=3.0, rolling_window=6):
+    """
+    Per-sample deltas against the previous sample of the same product, in vectorized form.
+
+    - sold_delta: increase in total_sold. A drop is treated as a counter reset
+      (the new value counts as sold since the reset).
+    - stock_depletion / restock: decrease / increase in total_stock.
+    - revenue: sold_delta x mean price of the two samples.
+    - sales_per_hour: sold_delta over the elapsed hours; `gap` marks intervals
+      longer than max_gap_hours, whose rate is an average over the gap.
+    - rolling_sales_per_hour: sales over the last `rolling_window` intervals of
+      the product divided by their elapsed time.
+    The first sample of every product has NaN deltas.
+    """
+    n = len(samples)
+    first = np.zeros(n, dtype=bool)
+    first[samples.starts] = True
+
+    prev = np.arange(n) - 1
+    prev[first] = 0
+
+    dt_hours = (samples.ts - samples.ts[prev]) / 3600.0
+    sold_delta = samples.total_sold - samples.total_sold[prev]
+    resets = sold_delta < 0
+    sold_delta[resets] = samples.total_sold[resets]
+
+    stock_delta = samples.total_stock - samples.total_stock[prev]
+    stock_depletion = np.where(stock_delta < 0, -stock_delta, 0.0)
+    restock = np.where(stock_delta > 0, stock_delta, 0.0)
+    stock_depletion[np.isnan(stock_delta)] = np.nan
+    restock[np.isnan(stock_delta)] = np.nan
+
+    # Fall back to whichever side has a price
+    price_prev = samples.price[prev]
+    mean_price = np.where(np.isnan(price_prev), samples.price,
+                          np.where(np.isnan(samples.price), price_prev, (samples.price + price_prev) / 2))
+    revenue = sold_delta * mean_price
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sales_per_hour = np.where(dt_hours > 0, sold_delta / dt_hours, np.nan)
+
+    for column in (dt_hours, sold_delta, stock_depletion, restock, revenue, sales_per_hour):
+        column[first] = np.nan
+
+    # Rolling rate from per-product cumulative sums: window start is clamped to the group start
+    sold_cum = np.cumsum(np.nan_to_num(sold_delta))
+    hours_cum = np.cumsum(np.nan_to_num(dt_hours))
+    window_start = np.maximum(np.arange(n) - rolling_window, samples.group_index())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rolling_hours = hours_cum - hours_cum[window_start]
+        rolling = np.where(rolling_hours > 0, (sold_cum - sold_cum[window_start]) / rolling_hours, np.nan)
+    rolling[first] = np.nan
+
+    return {
+        "product_id": samples.product_ids,
+        "ts": samples.ts,
+        "total_sold": samples.total_sold,
+        "total_stock": samples.total_stock,
+        "price": samples.price,
+        "hours": dt_hours,
+        "sold_delta": sold_delta,
+        "counter_reset": resets & ~first,
+        "gap": dt_hours > max_gap_hours,
+        "sales_per_hour": sales_per_hour,
+        "rolling_sales_per_hour": rolling,
+        "stock_depletion": stock_depletion,
+        "restock": restock,
+        "revenue": revenue,
+    }
+
+
+def aggregate(intervals, bucket="hour"):
+    """
+    Sums interval deltas into per-product hourly or daily buckets.
+    An interval is attributed to the bucket its closing sample falls in.
+    """
+    size = BUCKET_SECONDS[bucket]
+    product_ids = intervals["product_id"]
+    valid = ~np.isnan(intervals["hours"])
+    if not valid.any():
+        return {key: np.zeros(0) for key in ("product_id", "bucket_start", "samples", "sold",
+                                            "revenue", "stock_depletion", "restock", "last_stock", "last_price")}
+
+    ids = product_ids[valid]
+    buckets = np.floor(intervals["ts"][valid] / size) * size
+    # Rows are ordered by (product, ts), so (product, bucket) runs are contiguous
+    boundary = np.ones(len(ids), dtype=bool)
+    boundary[1:] = (ids[1:] != ids[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.concatenate((starts[1:], [len(ids)])) - 1
+
+    def total(name):
+        return np.add.reduceat(np.nan_to_num(intervals[name][valid]), starts)
+
+    return {
+        "product_id": ids[starts],
+        "bucket_start": buckets[starts],
+        "samples": np.diff(np.concatenate((starts, [len(ids)]))),
+        "sold": total("sold_delta"),
+        "revenue": total("revenue"),
+        "stock_depletion": total("stock_depletion"),
+        "restock": total("restock"),
+        "last_stock": intervals["total_stock"][valid][ends],
+        "last_price": intervals["price"][valid][ends],
+    }
+
+
+def _iso(values):
+    return [datetime.fromtimestamp(v, tz=timezone.utc).isoformat() for v in values]
+
+
+def write_csv(table, path, time_columns=("ts", "bucket_start")):
+    columns = list(table)
+    data = [_iso(table[c]) if c in time_columns else table[c].tolist() for c in columns]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*data))
+
+
+def write_parquet(table, path):
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required for Parquet output")
+    arrays = {name: (values.astype(str) if values.dtype == object else values) for name, values in table.items()}
+    pyarrow.parquet.write_table(pyarrow.table(arrays), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales / stock / revenue report over monitor history.")
+    parser.add_argument("--db", default="monitor.db", help="Sample store to read")
+    parser.add_argument("--jsonl", help="Read a JSONL monitor log instead of the store")
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    parser.add_argument("--bucket", choices=sorted(BUCKET_SECONDS), default="hour")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default="report", help="Output path prefix")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.jsonl:
+        samples = SampleArrays.from_jsonl(args.jsonl)
+    else:
+        store = SampleStore(args.db)
+        try:
+            samples = SampleArrays.from_store(store, args.since, args.until)
+        finally:
+            store.close()
+    loaded = time.perf_counter()
+
+    intervals = compute_intervals(samples)
+    buckets = aggregate(intervals, args.bucket)
+    computed = time.perf_counter()
+
+    writer = write_parquet if args.format == "parquet" else write_csv
+    writer(intervals, f"{args.out}_intervals.{args.format}")
+    writer(buckets, f"{args.out}_{BUCKET_NAMES[args.bucket]}.{args.format}")
+    logging.info(f"{len(samples)} samples, {len(samples.starts)} products: load {loaded - start:.2f}s, "
+                 f"compute {computed - loaded:.2f}s, write {time.perf_counter() - computed:.2f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+# Statuses worth another attempt (possibly through another proxy); anything else 4xx is final
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class TransientError(Exception):
+    """A failed attempt that may succeed when retried (timeout, connection reset, 429/5xx, signer hiccup)."""
+
+
+class RetryPolicy:
+    """
+    Retries one pipeline stage with jittered exponential backoff.
+
+    An attempt is retried when it raises TransientError, asyncio.TimeoutError or one
+    of `retry_on`; up to `attempts` tries in total. The n-th retry waits a random
+    delay in [0, min(max_delay, base_delay * 2**n)] ("full jitter"), so products that
+    failed together do not retry in lockstep. `timeout` (seconds) bounds each attempt.
+    """
+
+    def __init__(self, attempts=3, base_delay=1.0, max_delay=30.0, timeout=None, retry_on=(), name="request"):
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.retry_on = (TransientError, asyncio.TimeoutError) + tuple(retry_on)
+        self.name = name
+        self.retries = 0
+        self.exhausted = 0
+
+    def delay(self, retry):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def _should_retry(self, attempt, error, label):
+        if attempt + 1 >= self.attempts:
+            self.exhausted += 1
+            return False
+        self.retries += 1
+        logging.warning(f"{self.name} failed for {label} ({error or type(error).__name__}); "
+                        f"retry {attempt + 1}/{self.attempts - 1}.")
+        return True
+
+    async def run(self, call, label=""):
+        """Awaits `call()` (a coroutine function) until it succeeds or attempts run out; re-raises the last error."""
+        for attempt in range(self.attempts):
+            try:
+                if self.timeout:
+                    return await asyncio.wait_for(call(), self.timeout)
+                return await call()
+            except self.retry_on as e:
+                if not self._should_retry(attempt, e, label):
+                    raise
+            await asyncio.sleep(self.delay(attempt))
+
+    def run_sync(self, call, label=""):
+        """Blocking variant of run() for the single-product path; `timeout` is left to `call`."""
+        for attempt in range(self.attempts):
+            try:
+                return call()
+            except self.retry_on as e:
+                if not self._should_retry(attempt, e, label):
+                    raise
+            time.sleep(self.delay(attempt))
+
+
+class HedgePolicy:
+    """
+    Sends a duplicate request when the first is slower than the `percentile` of
+    recent latencies; whichever succeeds first wins and the other is cancelled.
+    Hedging starts once `min_samples` latencies have been observed.
+    """
+
+    def __init__(self, percentile=0.95, min_samples=20, window=500):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, seconds):
+        self._latencies.append(seconds)
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while there is too little history."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    async def run(self, call):
+        delay = self.delay()
+        if delay is None:
+            return await call()
+
+        first = asyncio.ensure_future(call())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        self.hedged += 1
+        second = asyncio.ensure_future(call())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class CircuitBreaker:
+    """
+    Pauses callers while a dependency (the signer) is down.
+
+    After `failure_threshold` consecutive failures the breaker opens and `acquire()`
+    blocks for `reset_seconds`. Then a single trial call is let through (half-open):
+    success closes the breaker, failure re-opens it with the wait doubled up to
+    `max_reset_seconds`. `acquire()` returns a token for the trial caller, who must
+    hand it to `end_trial()` when done, so a trial that is cancelled or fails before
+    any result is recorded frees the slot for the next caller.
+    """
+
+    def __init__(self, name="signer", failure_threshold=5, reset_seconds=30.0, max_reset_seconds=300.0):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_reset = reset_seconds
+        self.max_reset = max_reset_seconds
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.open_until = 0.0
+        self.opened = 0
+        self.trials = 0
+        self._trial = None
+        self._closed = asyncio.Event()
+        self._closed.set()
+
+    @property
+    def state(self):
+        if self._closed.is_set():
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+
+    async def acquire(self):
+        """Waits while the breaker is open. Returns the trial token when this caller is the half-open trial, else None."""
+        while not self._closed.is_set():
+            remaining = self.open_until - time.monotonic()
+            if remaining <= 0 and self._trial is None:
+                self.trials += 1
+                self._trial = self.trials
+                logging.info(f"Circuit {self.name} half-open; sending a trial request.")
+                return self._trial
+            # While a trial is in flight, re-check periodically in case it never reports back
+            try:
+                await asyncio.wait_for(self._closed.wait(), remaining if remaining > 0 else 1.0)
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    def end_trial(self, token):
+        """Frees the trial slot if trial `token` ended without record() resolving it."""
+        if token is not None and self._trial == token:
+            self._trial = None
+
+    def record(self, ok):
+        if ok:
+            if not self._closed.is_set():
+                logging.info(f"Circuit {self.name} closed; resuming.")
+            self.failures = 0
+            self.reset_seconds = self.base_reset
+            self._trial = None
+            self._closed.set()
+            return
+
+        self.failures += 1
+        if self._trial is not None:
+            self._trial = None
+            self.reset_seconds = min(self.reset_seconds * 2, self.max_reset)
+        elif self.failures < self.failure_threshold or not self._closed.is_set():
+            return
+        self.opened += 1
+        self.open_until = time.monotonic() + self.reset_seconds
+        self._closed.clear()
+        logging.warning(f"Circuit {self.name} open after {self.failures} failures; "
+                        f"pausing for {self.reset_seconds:.0f}s.")
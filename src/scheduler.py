@@ -0,0 +1,263 @@
+import asyncio
+import heapq
+import logging
+import time
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host so a fleet of products sharing one host (tiktok.com)
+    cannot burst past a fixed number of requests per second.
+    """
+
+    def __init__(self, rate_per_sec=2.0, burst=None):
+        self.rate = float(rate_per_sec)
+        self.burst = float(burst if burst is not None else max(1.0, self.rate))
+        self._buckets = {}
+        self._locks = {}
+
+    def set_rate(self, rate_per_sec):
+        """Changes the rate (and the burst with it); buckets keep their tokens."""
+        self.rate = float(rate_per_sec)
+        self.burst = max(1.0, self.rate)
+
+    async def acquire(self, host):
+        if self.rate <= 0:
+            return
+
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            tokens, last = self._buckets.get(host, (self.burst, time.monotonic()))
+            while True:
+                now = time.monotonic()
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                last = now
+                if tokens >= 1.0:
+                    self._buckets[host] = (tokens - 1.0, last)
+                    return
+                await asyncio.sleep((1.0 - tokens) / self.rate)
+
+
+class AdaptiveIntervalPolicy:
+    """
+    Per-product polling intervals driven by observed movement.
+
+    A product whose total_sold or total_stock changed since its previous sample
+    has its interval multiplied by `shrink`; an unchanged one by `grow`, both
+    clamped to [min_hours, max_hours]. The fleet's demand (sum of 1/interval, in
+    requests/hour) is tracked incrementally; when it exceeds `budget_per_hour`
+    every interval is stretched by demand/budget so the fleet stays within budget.
+    """
+
+    def __init__(self, base_hours=1.0, min_hours=0.25, max_hours=6.0, budget_per_hour=None,
+                 shrink=0.5, grow=1.5):
+        self.base = float(base_hours) * 3600
+        self.min = float(min_hours) * 3600
+        self.max = float(max_hours) * 3600
+        self.budget = float(budget_per_hour) if budget_per_hour else None
+        self.shrink = shrink
+        self.grow = grow
+        self._intervals = {}
+        self._last = {}
+        self._demand = 0.0
+
+    def _set(self, key, interval):
+        old = self._intervals.get(key)
+        if old is not None:
+            self._demand -= 3600.0 / old
+        self._intervals[key] = interval
+        self._demand += 3600.0 / interval
+
+    def observe(self, key, sample):
+        """Adjusts key's interval from a new sample (None when the fetch failed)."""
+        if key not in self._intervals:
+            self._set(key, min(max(self.base, self.min), self.max))
+        if not sample:
+            # Failed fetches say nothing about movement; keep the current interval
+            return
+        current = (sample.get("total_sold"), sample.get("total_stock"))
+        previous = self._last.get(key)
+        self._last[key] = current
+        if previous is None:
+            return
+        factor = self.shrink if current != previous else self.grow
+        self._set(key, min(max(self._intervals[key] * factor, self.min), self.max))
+
+    def state(self):
+        """Intervals and last (sold, stock) per key, as plain data for a checkpoint."""
+        return {"intervals": dict(self._intervals), "last": {k: list(v) for k, v in self._last.items()}}
+
+    def restore(self, state, keys=None):
+        """Reloads state() output, limited to `keys` when given."""
+        for key, interval in state.get("intervals", {}).items():
+            if keys is None or key in keys:
+                self._set(key, min(max(float(interval), self.min), self.max))
+        for key, last in state.get("last", {}).items():
+            if keys is None or key in keys:
+                self._last[key] = tuple(last)
+
+    def forget(self, key):
+        if key in self._intervals:
+            self._demand -= 3600.0 / self._intervals.pop(key)
+        self._last.pop(key, None)
+
+    @property
+    def demand_per_hour(self):
+        return self._demand
+
+    def fleet_demand(self, products):
+        """
+        Requests/hour for `products` scheduled keys: tracked keys at their current
+        interval, the rest at the base interval, capped by the budget.
+        """
+        unseen = max(0, products - len(self._intervals))
+        demand = self._demand + unseen * 3600.0 / min(max(self.base, self.min), self.max)
+        return min(demand, self.budget) if self.budget else demand
+
+    def budget_factor(self):
+        if not self.budget or self._demand <= self.budget:
+            return 1.0
+        return self._demand / self.budget
+
+    def interval(self, key):
+        """Seconds until key's next poll, including the budget stretch."""
+        base = self._intervals.get(key, min(max(self.base, self.min), self.max))
+        return base * self.budget_factor()
+
+
+class FleetScheduler:
+    """
+    Priority-queue scheduler for many products in one event loop.
+
+    Due times live in a min-heap of (due_ts, seq, url). The run loop sleeps until
+    the earliest entry is due, then hands it to a bounded pool of poll tasks.
+    Only a url's latest entry (its seq in `_entries`) is live; re-adding or removing a
+    url leaves the old entry in the heap to be skipped when it reaches the top.
+    """
+
+    def __init__(self, interval_hours=1, max_concurrency=20, host_rate=2.0, policy=None):
+        self.interval = float(interval_hours) * 3600
+        self.policy = policy
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate_limiter = HostRateLimiter(host_rate)
+        self._heap = []
+        self._seq = 0
+        self._entries = {}
+        self._in_flight = {}
+        self._removed = set()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        # Scheduled urls, including those being polled right now (at most max_concurrency)
+        polling = sum(1 for url in self._in_flight if url not in self._entries and url not in self._removed)
+        return len(self._entries) + polling
+
+    def add(self, url, due=None):
+        """Schedule url at due (epoch seconds); defaults to now. Replaces url's previous due time."""
+        self._removed.discard(url)
+        self._seq += 1
+        self._entries[url] = self._seq
+        heapq.heappush(self._heap, (due if due is not None else time.time(), self._seq, url))
+        self._wakeup.set()
+
+    def remove(self, url):
+        """Unschedules url; a poll already running for it finishes but is not rescheduled."""
+        self._entries.pop(url, None)
+        if url in self._in_flight:
+            self._removed.add(url)
+
+    def _prune(self):
+        # Drop superseded or removed entries from the top of the heap
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def due_times(self):
+        """{url: due} for every scheduled url, including ones being polled right now (at their old due time)."""
+        dues = {url: due for due, seq, url in self._heap if self._entries.get(url) == seq}
+        dues.update((url, due) for url, due in self._in_flight.items() if url not in self._removed)
+        return dues
+
+    def next_due(self):
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def interval_for(self, url):
+        return self.policy.interval(url) if self.policy is not None else self.interval
+
+    def reschedule(self, url, due, completed_at):
+        """Next due time for url; keeps the original cadence unless we fell behind."""
+        interval = self.interval_for(url)
+        next_due = due + interval
+        if next_due < completed_at:
+            next_due = completed_at + interval
+        self.add(url, next_due)
+
+    async def _wait_for_due(self, end_ts):
+        while True:
+            due = self.next_due()
+            now = time.time()
+            if now >= end_ts:
+                return False
+            if due is None:
+                timeout = end_ts - now
+            elif due <= now:
+                return True
+            else:
+                timeout = min(due, end_ts) - now
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, poll, end_ts):
+        """
+        Polls due urls with `await poll(url)` until end_ts (epoch seconds).
+        Each url is re-queued one interval after its previous due time; with a
+        policy, poll's return value (the sample or None) drives that interval.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = set()
+
+        async def _poll_one(url, due):
+            try:
+                host = urlparse(url).hostname or ""
+                await self.rate_limiter.acquire(host)
+                sample = await poll(url)
+                if self.policy is not None:
+                    self.policy.observe(url, sample)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Poll failed for {url}: {e}")
+            finally:
+                semaphore.release()
+                self._in_flight.pop(url, None)
+                if url in self._removed:
+                    self._removed.discard(url)
+                else:
+                    self.reschedule(url, due, time.time())
+
+        try:
+            while await self._wait_for_due(end_ts):
+                await semaphore.acquire()
+                # The heap may have changed while we waited for a slot (removals, re-adds)
+                due = self.next_due()
+                if due is None or due > time.time():
+                    semaphore.release()
+                    continue
+                due, _, url = heapq.heappop(self._heap)
+                del self._entries[url]
+                self._in_flight[url] = due
+                task = asyncio.create_task(_poll_one(url, due))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Let in-flight polls finish so their samples are recorded
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,56 @@
+import logging
+
+from proxies import redact_url
+
+DEFAULT_IMPERSONATE = "chrome124"
+
+
+class SessionPool:
+    """
+    Shared curl_cffi AsyncSessions, one per (proxy, impersonation profile).
+
+    Reusing a session keeps its connections alive, so concurrent fetches through
+    the same exit node share TLS handshakes instead of opening a new socket each time.
+    The signer gets its own plain (non-impersonated) session. curl_cffi (~125ms to
+    import) is loaded when the first session is opened, not at import time.
+    """
+
+    def __init__(self, impersonate=DEFAULT_IMPERSONATE, max_clients=20):
+        self.impersonate = impersonate
+        self.max_clients = max_clients
+        self._sessions = {}
+        self._signer_session = None
+
+    def get(self, proxies=None, impersonate=None):
+        proxy_key = tuple(sorted(proxies.items())) if proxies else None
+        key = (proxy_key, impersonate or self.impersonate)
+        session = self._sessions.get(key)
+        if session is None:
+            from curl_cffi import requests as cffi_requests
+            session = cffi_requests.AsyncSession(
+                impersonate=key[1],
+                proxies=proxies,
+                max_clients=self.max_clients,
+            )
+            self._sessions[key] = session
+            shown = {scheme: redact_url(url) for scheme, url in proxies.items()} if proxies else None
+            logging.info(f"Opened fetch session (proxies={shown}, impersonate={key[1]}).")
+        return session
+
+    def signer(self):
+        if self._signer_session is None:
+            from curl_cffi import requests as cffi_requests
+            self._signer_session = cffi_requests.AsyncSession(max_clients=self.max_clients)
+        return self._signer_session
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        if self._signer_session is not None:
+            sessions.append(self._signer_session)
+        self._sessions = {}
+        self._signer_session = None
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                logging.warning(f"Error closing session: {e}")
@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+
+def canonical_url(url):
+    """
+    Canonical form used as the signature cache key: lowercase scheme/host,
+    sorted query parameters and no fragment.
+    """
+    parsed = urlparse(url.strip())
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((
+        parsed.scheme.lower(),
+        parsed.netloc.lower(),
+        parsed.path or "/",
+        parsed.params,
+        query,
+        "",
+    ))
+
+
+class TTLCache:
+    """Small dict-backed cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = float(ttl)
+        self.max_entries = max_entries
+        self._data = {}
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        if len(self._data) >= self.max_entries:
+            self.purge()
+            if len(self._data) >= self.max_entries:
+                # Still full of live entries: drop the oldest insertion
+                self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def purge(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._data.items() if expires < now]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SignerEndpoint:
+    """One signature service instance and its load/health state."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.base_url = self.url.rsplit("/signature", 1)[0]
+        self.outstanding = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.failures = 0
+
+    def available(self, now):
+        return self.healthy and self.ejected_until <= now
+
+    def __repr__(self):
+        return f"SignerEndpoint({self.url}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+
+class SignerPool:
+    """
+    Load-balances signing across several signature service instances.
+
+    Requests go to the available endpoint with the fewest outstanding requests.
+    `GET /health` is probed periodically; an instance whose `byted_acrawler` signer
+    has gone missing (or that stops answering) is ejected until a probe passes again.
+    Consecutive request failures eject an instance for `eject_seconds`.
+    """
+
+    def __init__(self, urls, sessions, probe_interval=30, eject_seconds=60, max_failures=3, timeout=10):
+        self.endpoints = [SignerEndpoint(url) for url in dict.fromkeys(urls)]
+        if not self.endpoints:
+            raise ValueError("SignerPool needs at least one signer URL")
+        self.sessions = sessions
+        self.probe_interval = probe_interval
+        self.eject_seconds = eject_seconds
+        self.max_failures = max_failures
+        self.timeout = timeout
+        self._health_task = None
+
+    def acquire(self, exclude=()):
+        """
+        Picks the least-loaded available endpoint and counts the request against it.
+        Falls back to ejected endpoints when nothing is available, so signing never stalls entirely.
+        """
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude and e.available(now)]
+        if not candidates:
+            candidates = [e for e in self.endpoints if e not in exclude]
+        if not candidates:
+            return None
+        endpoint = min(candidates, key=lambda e: e.outstanding)
+        endpoint.outstanding += 1
+        return endpoint
+
+    def release(self, endpoint, ok=True):
+        endpoint.outstanding -= 1
+        if ok:
+            endpoint.failures = 0
+            return
+        endpoint.failures += 1
+        if endpoint.failures >= self.max_failures:
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            logging.warning(f"Ejecting signer {endpoint.url} for {self.eject_seconds}s after {endpoint.failures} failures.")
+
+    async def probe(self, endpoint, quiet=False):
+        """Checks one endpoint's /health and updates its state. Returns True if healthy."""
+        try:
+            response = await self.sessions.signer().get(endpoint.base_url + "/health", timeout=self.timeout)
+            data = response.json() if response.status_code in (200, 503) else {}
+            healthy = bool(data.get("signer"))
+        except Exception as e:
+            if not quiet:
+                logging.warning(f"Health probe failed for {endpoint.url}: {e}")
+            healthy = False
+
+        if not quiet and healthy and not endpoint.healthy:
+            logging.info(f"Signer {endpoint.url} is healthy again.")
+        elif not quiet and not healthy and endpoint.healthy:
+            logging.warning(f"Signer {endpoint.url} is unhealthy (byted_acrawler missing or unreachable); ejecting.")
+        endpoint.healthy = healthy
+        if healthy:
+            endpoint.failures = 0
+            endpoint.ejected_until = 0.0
+        return healthy
+
+    async def probe_all(self):
+        results = await asyncio.gather(*(self.probe(e) for e in self.endpoints))
+        return sum(results)
+
+    async def wait_ready(self, timeout=120, base_delay=0.25, max_delay=1.0):
+        """
+        Probes every endpoint with exponential backoff until at least one reports a loaded
+        signer, for use while the browsers are still starting. Returns the number of ready
+        endpoints (0 if `timeout` seconds pass first).
+        """
+        deadline = time.monotonic() + timeout
+        delay = base_delay
+        while True:
+            ready = sum(await asyncio.gather(*(self.probe(e, quiet=True) for e in self.endpoints)))
+            if ready or time.monotonic() >= deadline:
+                return ready
+            await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, max_delay)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.probe_all()
+
+    def start(self):
+        if self._health_task is None and self.probe_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    def stats(self):
+        return [
+            {"url": e.url, "outstanding": e.outstanding, "healthy": e.healthy,
+             "ejected": e.ejected_until > time.monotonic(), "failures": e.failures}
+            for e in self.endpoints
+        ]
+
+
+class SignerClient:
+    """
+    Client for the Node.js signature service(s).
+
+    The service signs the exact URL it is given and the signed data records that URL
+    (`url`), which is the one to fetch. Signed data is cached per canonical URL, so
+    spellings of the same URL share one signature, and each instance's browser identity
+    (cookies and user agent) is cached on its own so the service can skip collecting
+    it. Concurrent `sign()` calls made within `batch_window` seconds are coalesced
+    into a single POST to `/signature/batch`, so signer round-trips grow with the
+    number of batches rather than with the number of products. Batches are spread
+    across the instances of a SignerPool. With a CircuitBreaker, each request to the
+    service counts as one success or failure, however many URLs it carried.
+    """
+
+    def __init__(self, pool, sessions, signature_ttl=300, identity_ttl=900,
+                 batch_size=50, batch_window=0.05, timeout=30, breaker=None):
+        self.pool = pool
+        self.breaker = breaker
+        self.sessions = sessions
+        self.signatures = TTLCache(signature_ttl)
+        self.identities = TTLCache(identity_ttl, max_entries=max(1, len(pool.endpoints)))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self._pending = {}
+        self._flush_handle = None
+        self._flush_tasks = set()
+        self._no_batch = set()
+
+    def _signed_data(self, url, signature, identity):
+        # Same shape as the single /signature response `data`, plus the URL that was signed
+        return {
+            "url": url,
+            "signed_url": signature,
+            "signature_data": signature,
+            "cookies": identity.get("cookies"),
+            "navigator": {"user_agent": identity.get("user_agent")},
+        }
+
+    async def sign(self, url):
+        """
+        Returns the signed data dict for url (see build_signed_request), or None on failure.
+        """
+        key = canonical_url(url)
+        cached = self.signatures.get(key)
+        if cached is not None:
+            return cached
+
+        entry = self._pending.get(key)
+        if entry is not None:
+            future = entry[1]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = (url, future)
+            if len(self._pending) >= self.batch_size:
+                self._flush_now()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush_now)
+        return await asyncio.shield(future)
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            # Keep a reference so the task is not garbage-collected while in flight
+            task = asyncio.create_task(self._flush(pending))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, pending):
+        urls = [url for url, _ in pending.values()]
+        try:
+            results = await self.sign_many(urls)
+        except Exception as e:
+            logging.error(f"Error calling signature service: {e}")
+            results = [None] * len(urls)
+        for (_, future), result in zip(pending.values(), results):
+            if not future.done():
+                future.set_result(result)
+
+    async def sign_many(self, urls):
+        """
+        Signs a list of URLs, returning signed data dicts (or None) in the same order.
+        Cached signatures are reused; the rest go to the service in batches, as the
+        first spelling seen of each canonical URL.
+        """
+        keys = [canonical_url(url) for url in urls]
+        signed = {}
+        to_sign = {}
+        for key, url in zip(keys, urls):
+            if key in signed or key in to_sign:
+                continue
+            cached = self.signatures.get(key)
+            if cached is not None:
+                signed[key] = cached
+            else:
+                to_sign[key] = url
+        missing = list(to_sign.values())
+
+        chunks = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        for fresh in await asyncio.gather(*(self._sign_chunk(chunk) for chunk in chunks)):
+            signed.update((canonical_url(url), data) for url, data in fresh.items())
+
+        return [signed.get(key) for key in keys]
+
+    async def _sign_chunk(self, urls):
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(exclude=tried)
+            if endpoint is None:
+                return {}
+            tried.append(endpoint)
+            ok = False
+            try:
+                if endpoint.url in self._no_batch:
+                    signed = await self._request_singles(endpoint, urls)
+                else:
+                    signed = await self._request_batch(endpoint, urls)
+                ok = bool(signed)
+            except Exception as e:
+                logging.error(f"Error calling signature service {endpoint.url}: {e}")
+                signed = {}
+            finally:
+                self.pool.release(endpoint, ok)
+                if self.breaker is not None:
+                    self.breaker.record(ok)
+            if ok:
+                for url, data in signed.items():
+                    self.signatures.set(canonical_url(url), data)
+                return signed
+
+    def _store_identity(self, endpoint, data):
+        identity = {
+            "cookies": data.get("cookies"),
+            "user_agent": data.get("navigator", {}).get("user_agent"),
+        }
+        self.identities.set(endpoint.url, identity)
+        return identity
+
+    async def _request_batch(self, endpoint, urls):
+        identity = self.identities.get(endpoint.url)
+        response = await self.sessions.signer().post(
+            endpoint.url + "/batch", json={"urls": urls, "identity": identity is None}, timeout=self.timeout
+        )
+        if response.status_code == 404:
+            # Older signer without the batch endpoint
+            logging.warning(f"Signer {endpoint.url} has no batch endpoint; falling back to single requests.")
+            self._no_batch.add(endpoint.url)
+            return await self._request_singles(endpoint, urls)
+
+        response.raise_for_status()
+        json_resp = response.json()
+        if json_resp.get("status") != "ok":
+            logging.error(f"Signature service returned status: {json_resp.get('status')}")
+            return {}
+
+        data = json_resp.get("data", {})
+        if data.get("navigator"):
+            identity = self._store_identity(endpoint, data)
+        if identity is None:
+            return {}
+        signed = {}
+        for url, signature in zip(urls, data.get("signatures", [])):
+            if signature and not (isinstance(signature, dict) and "error" in signature):
+                signed[url] = self._signed_data(url, signature, identity)
+            else:
+                logging.error(f"Signer failed for {url}: {signature}")
+        return signed
+
+    async def _request_singles(self, endpoint, urls):
+        signed = {}
+        for url in urls:
+            response = await self.sessions.signer().post(endpoint.url, json={"url": url}, timeout=self.timeout)
+            response.raise_for_status()
+            json_resp = response.json()
+            if json_resp.get("status") != "ok":
+                logging.error(f"Signature service returned status: {json_resp.get('status')}")
+                continue
+            data = json_resp.get("data", {})
+            signed[url] = self._signed_data(url, data.get("signed_url"), self._store_identity(endpoint, data))
+        return signed
@@ -0,0 +1,237 @@
+import argparse
+import json
+import math
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from changes import expand_records
+from store import SampleStore, read_jsonl, to_epoch
+
+# Stock cell for a SKU that was absent from a sample (or had no stock figure)
+MISSING = -1
+
+
+def _int_or_missing(value):
+    if value is None:
+        return MISSING
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return MISSING
+
+
+class SkuSeries:
+    """
+    SKU history for one product in flat typed arrays.
+
+    `ts` holds sample times and `stock` the matching rows of per-SKU stock, row-major
+    ([sample][sku], int32, MISSING where absent), so a sample costs 8 bytes plus
+    4 bytes per SKU. Per-SKU state (last stock/sold/price, estimated units sold,
+    restocks) is one array each. Price changes go to a short log instead of a
+    per-sample column since prices rarely move.
+    """
+
+    __slots__ = ("product_id", "sku_ids", "index", "ts", "stock", "last_stock", "last_sold", "price",
+                 "sold", "restocks", "price_changes")
+
+    def __init__(self, product_id, max_price_changes=64):
+        self.product_id = product_id
+        self.sku_ids = []
+        self.index = {}
+        self.ts = array("d")
+        self.stock = array("i")
+        self.last_stock = array("i")
+        self.last_sold = array("d")
+        self.price = array("d")
+        self.sold = array("d")
+        self.restocks = array("I")
+        self.price_changes = deque(maxlen=max_price_changes)
+
+    @property
+    def stride(self):
+        return len(self.sku_ids)
+
+    def _add_sku(self, sku_id):
+        old_stride = self.stride
+        self.index[sku_id] = old_stride
+        self.sku_ids.append(sku_id)
+        if self.ts:
+            # Re-lay the rows one column wider; new variants are rare
+            padded = array("i")
+            for row in range(len(self.ts)):
+                padded.extend(self.stock[row * old_stride:(row + 1) * old_stride])
+                padded.append(MISSING)
+            self.stock = padded
+        self.last_stock.append(MISSING)
+        self.last_sold.append(math.nan)
+        self.price.append(math.nan)
+        self.sold.append(0.0)
+        self.restocks.append(0)
+        return old_stride
+
+    def update(self, ts, skus):
+        """Appends one sample's SKUs; samples older than the latest one are ignored."""
+        if self.ts and ts <= self.ts[-1]:
+            return False
+        for sku in skus:
+            if sku["sku_id"] not in self.index:
+                self._add_sku(sku["sku_id"])
+
+        row = array("i", [MISSING]) * self.stride
+        for sku in skus:
+            i = self.index[sku["sku_id"]]
+            stock = _int_or_missing(sku.get("stock"))
+            sold = sku.get("sold")
+            row[i] = stock
+
+            # Prefer the SKU's own sold counter; fall back to stock depletion
+            if sold is not None and not math.isnan(self.last_sold[i]) and sold >= self.last_sold[i]:
+                self.sold[i] += sold - self.last_sold[i]
+            elif stock != MISSING and self.last_stock[i] != MISSING and stock < self.last_stock[i]:
+                self.sold[i] += self.last_stock[i] - stock
+            if stock != MISSING and self.last_stock[i] != MISSING and stock > self.last_stock[i]:
+                self.restocks[i] += 1
+
+            if stock != MISSING:
+                self.last_stock[i] = stock
+            if sold is not None:
+                self.last_sold[i] = sold
+            price = sku.get("price")
+            if price is not None and price != self.price[i]:
+                if not math.isnan(self.price[i]):
+                    self.price_changes.append((ts, sku["sku_id"], self.price[i], price))
+                self.price[i] = price
+
+        self.ts.append(ts)
+        self.stock.extend(row)
+        return True
+
+    def trim(self, before_ts, max_samples):
+        """Drops samples older than before_ts and beyond the newest max_samples."""
+        cut = max(bisect_left(self.ts, before_ts), len(self.ts) - max_samples)
+        if cut > 0:
+            del self.ts[:cut]
+            del self.stock[:cut * self.stride]
+
+    def column(self, sku_id):
+        """(ts, stock) pairs for one SKU over the retained window, skipping missing cells."""
+        i = self.index[sku_id]
+        stride = self.stride
+        return [(ts, self.stock[row * stride + i]) for row, ts in enumerate(self.ts)
+                if self.stock[row * stride + i] != MISSING]
+
+    def depletion_since(self, sku_id, since_ts):
+        """Units of stock that disappeared since since_ts (restocks excluded)."""
+        units = 0
+        previous = None
+        for ts, stock in self.column(sku_id):
+            if previous is not None and ts >= since_ts and stock < previous:
+                units += previous - stock
+            previous = stock
+        return units
+
+    def nbytes(self):
+        arrays = (self.ts, self.stock, self.last_stock, self.last_sold, self.price, self.sold, self.restocks)
+        return sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+
+
+class SkuBook:
+    """
+    Per-SKU stock/price tracking for the whole fleet.
+
+    Each product is a SkuSeries trimmed to the last `window_hours` and at most
+    `max_samples` samples, so memory is bounded by products x SKUs x max_samples x 4 bytes
+    (20k products x 30 SKUs x 672 samples ~ 1.6 GB worst case; hourly polling over 7 days
+    is 168 samples, ~400 MB).
+    """
+
+    def __init__(self, window_hours=168, max_samples=672):
+        self.window = window_hours * 3600
+        self.max_samples = max_samples
+        self.products = {}
+
+    def update(self, sample):
+        skus = sample.get("skus")
+        if not skus:
+            return None
+        product_id = str(sample.get("product_id") or "unknown")
+        series = self.products.get(product_id)
+        if series is None:
+            series = self.products[product_id] = SkuSeries(product_id)
+        ts = to_epoch(sample["timestamp"])
+        if series.update(ts, skus):
+            # Trim lazily, in chunks, so the del is amortized over many samples
+            if len(series.ts) > self.max_samples + 16 or series.ts[0] < ts - self.window - 3600:
+                series.trim(ts - self.window, self.max_samples)
+        return series
+
+    def report(self, product_id, now=None):
+        """Per-SKU rows for one product, or None if it has no SKU data."""
+        series = self.products.get(str(product_id))
+        if series is None:
+            return None
+        now = now if now is not None else (series.ts[-1] if series.ts else 0)
+        rows = []
+        for i, sku_id in enumerate(series.sku_ids):
+            price = series.price[i]
+            rows.append({
+                "sku_id": sku_id,
+                "stock": series.last_stock[i] if series.last_stock[i] != MISSING else None,
+                "price": price if not math.isnan(price) else None,
+                "sold_estimate": series.sold[i],
+                "depleted_last_24h": series.depletion_since(sku_id, now - 86400),
+                "restocks": series.restocks[i],
+            })
+        return {"product_id": series.product_id, "samples": len(series.ts), "skus": rows,
+                "price_changes": list(series.price_changes)}
+
+    def stats(self):
+        return {
+            "products": len(self.products),
+            "skus": sum(s.stride for s in self.products.values()),
+            "samples": sum(len(s.ts) for s in self.products.values()),
+            "bytes": sum(s.nbytes() for s in self.products.values()),
+        }
+
+    @classmethod
+    def from_store(cls, store, since=None, **kwargs):
+        """Rebuilds the book from the sample store (samples carry their `skus` list)."""
+        book = cls(**kwargs)
+        for product_id in store.product_ids():
+            for sample in store.history(product_id, since=since):
+                book.update(sample)
+        return book
+
+    @classmethod
+    def from_jsonl(cls, path, **kwargs):
+        """Rebuilds the book from a JSONL monitor log (full samples or snapshot/delta records)."""
+        book = cls(**kwargs)
+        for sample in expand_records(read_jsonl(path)):
+            if sample.get("timestamp"):
+                book.update(sample)
+        return book
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-SKU stock report rebuilt from the sample store.")
+    parser.add_argument("product_ids", nargs="*", help="Products to report (default: all)")
+    parser.add_argument("--db", default="monitor.db")
+    parser.add_argument("--jsonl", help="Read a JSONL monitor log instead of the store")
+    parser.add_argument("--since", help="ISO timestamp; defaults to the last 7 days of each product")
+    args = parser.parse_args()
+
+    if args.jsonl:
+        book = SkuBook.from_jsonl(args.jsonl)
+    else:
+        store = SampleStore(args.db)
+        try:
+            book = SkuBook.from_store(store, since=args.since)
+        finally:
+            store.close()
+    for product_id in args.product_ids or list(book.products):
+        print(json.dumps(book.report(product_id)))
+
+
+if __name__ == "__main__":
+    main()
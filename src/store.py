@@ -0,0 +1,254 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    product_id  TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    timestamp   TEXT NOT NULL,
+    url         TEXT,
+    title       TEXT,
+    total_stock INTEGER,
+    total_sold  INTEGER,
+    price       REAL,
+    currency    TEXT,
+    status      TEXT,
+    data        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_samples_product_ts ON samples (product_id, ts);
+CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples (ts);
+"""
+
+COLUMNS = ("product_id", "ts", "timestamp", "url", "title", "total_stock",
+           "total_sold", "price", "currency", "status", "data")
+
+
+def to_epoch(timestamp):
+    """ISO timestamp (as written by the extractors) or epoch number -> epoch seconds."""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def to_number(value):
+    """
+    Numeric sample field as float. The JSON API reports prices as strings ("19.99")
+    and sometimes as a price dict (min_price / sale_price / price).
+    """
+    if isinstance(value, dict):
+        value = value.get("min_price") or value.get("sale_price") or value.get("price")
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_jsonl(path):
+    """Records from a JSONL file, skipping blank and malformed lines."""
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping malformed line {line_no} in {path}")
+
+
+# Debug-only sample fields left out of the stored JSON; raw responses go to the response archive
+_UNSTORED_FIELDS = ("raw_response_snippet",)
+
+
+def _row(sample, blob=True):
+    """Row tuple for `sample`; without `blob` the `data` JSON is left NULL (see SampleStore.add)."""
+    timestamp = sample.get("timestamp") or datetime.now().isoformat()
+    data = json.dumps({k: v for k, v in sample.items() if k not in _UNSTORED_FIELDS}) if blob else None
+    return (
+        str(sample.get("product_id") or "unknown"),
+        to_epoch(timestamp),
+        timestamp,
+        sample.get("url"),
+        sample.get("title"),
+        sample.get("total_stock"),
+        sample.get("total_sold"),
+        sample.get("price"),
+        sample.get("currency"),
+        sample.get("status"),
+        data,
+    )
+
+
+class SampleStore:
+    """
+    SQLite (WAL mode) time-series store for monitor samples.
+
+    `add()` only buffers; `flush()` writes the buffer in a single transaction, so a
+    tick costs one commit however many products it sampled. Rows are indexed on
+    (product_id, ts) for per-product range queries. A sample added as unchanged
+    keeps its columns but no `data` JSON; history() rebuilds it from the product's
+    previous full row.
+    """
+
+    def __init__(self, path="monitor.db", batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add(self, sample, changed=True):
+        """
+        Buffers one sample. `changed=False` (nothing tracked moved since the previous
+        sample) skips storing its JSON copy. Returns True when the buffer is due for a flush.
+        """
+        self._buffer.append(_row(sample, blob=changed))
+        return len(self._buffer) >= self.batch_size
+
+    def flush(self):
+        """Writes buffered samples in one transaction. Returns the number written."""
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO samples ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    rows,
+                )
+        return len(rows)
+
+    def upsert(self, samples, tolerance=1.0):
+        """
+        Writes samples in one transaction, replacing stored rows for the same URL within
+        `tolerance` seconds of each sample (the poll it was re-extracted from; archived
+        responses carry their sample's timestamp). Matching on URL rather than
+        product_id also replaces rows a stale extractor stored under the wrong id.
+        Flushes the buffer first so buffered rows are replaced too. Returns the number written.
+        """
+        self.flush()
+        rows = [_row(sample) for sample in samples]
+        if not rows:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM samples WHERE ts BETWEEN ? AND ? AND url = ?",
+                    [(row[1] - tolerance, row[1] + tolerance, row[3]) for row in rows],
+                )
+                self._conn.executemany(
+                    f"INSERT INTO samples ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    rows,
+                )
+        return len(rows)
+
+    def history(self, product_id, since=None, until=None, columns=None):
+        """
+        Samples for one product ordered by time; since/until are ISO strings or epoch seconds.
+        Returns the stored sample dicts, or tuples of `columns` when given.
+        """
+        query = f"SELECT {', '.join(columns) if columns else 'data, timestamp'} FROM samples WHERE product_id = ?"
+        params = [str(product_id)]
+        if since is not None:
+            query += " AND ts >= ?"
+            params.append(to_epoch(since))
+        if until is not None:
+            query += " AND ts < ?"
+            params.append(to_epoch(until))
+        query += " ORDER BY ts"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            if columns:
+                return rows
+            previous = None
+            if rows and rows[0][0] is None:
+                # The range starts on unchanged samples: start from the last full row before it
+                found = self._conn.execute(
+                    "SELECT data FROM samples WHERE product_id = ? AND ts < ? AND data IS NOT NULL "
+                    "ORDER BY ts DESC LIMIT 1", (str(product_id), to_epoch(rows[0][1]))).fetchone()
+                previous = json.loads(found[0]) if found else None
+        samples = []
+        for data, timestamp in rows:
+            if data is not None:
+                previous = json.loads(data)
+            elif previous is None:
+                continue
+            samples.append(dict(previous, timestamp=timestamp))
+        return samples
+
+    def range(self, since=None, until=None, columns=("product_id", "ts", "total_sold", "total_stock", "price")):
+        """All samples in a time range, ordered by (product_id, ts), as tuples of `columns`."""
+        query = f"SELECT {', '.join(columns)} FROM samples WHERE 1=1"
+        params = []
+        if since is not None:
+            query += " AND ts >= ?"
+            params.append(to_epoch(since))
+        if until is not None:
+            query += " AND ts < ?"
+            params.append(to_epoch(until))
+        query += " ORDER BY product_id, ts"
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def product_ids(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT product_id FROM samples")]
+
+    def import_jsonl(self, path):
+        """
+        Imports an existing monitor_log.jsonl. Snapshot/delta/heartbeat records are
+        expanded back into full samples. Returns the number of samples imported.
+        """
+        # changes imports this module for to_epoch
+        from changes import expand_records
+
+        count = 0
+        for sample in expand_records(read_jsonl(path)):
+            count += 1
+            if self.add(sample):
+                self.flush()
+        self.flush()
+        return count
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor sample store.")
+    parser.add_argument("--db", default="monitor.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import JSONL monitor logs")
+    imp.add_argument("files", nargs="+")
+    hist = sub.add_parser("history", help="Print a product's samples as JSONL")
+    hist.add_argument("product_id")
+    hist.add_argument("--since")
+    hist.add_argument("--until")
+    args = parser.parse_args()
+
+    store = SampleStore(args.db)
+    try:
+        if args.command == "import":
+            for path in args.files:
+                print(f"Imported {store.import_jsonl(path)} samples from {path}")
+        else:
+            for sample in store.history(args.product_id, args.since, args.until):
+                print(json.dumps(sample))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 #!/bin/bash
-# Start Node.js signature service in background
-node index.js &
-NODE_PID=$!
+# Start Node.js signature service(s) in background
+# SIGNER_INSTANCES > 1 starts one browser per instance on consecutive ports (8081, 8082, ...)
+SIGNER_INSTANCES=${SIGNER_INSTANCES:-1}
+NODE_PIDS=()
+SIGNER_URLS=()
+for ((i = 0; i < SIGNER_INSTANCES; i++)); do
+    PORT=$((8081 + i)) node index.js &
+    NODE_PIDS+=($!)
+    SIGNER_URLS+=("http://localhost:$((8081 + i))/signature")
+done
+export SIGNATURE_SERVICE_URLS=$(IFS=,; echo "${SIGNER_URLS[*]}")
 
-# Wait for service to be ready (simple sleep or curl loop)
-echo "Waiting for signature service..."
-sleep 5
+# No fixed wait: the monitor polls each signer's /health with backoff while it sets up,
+# so Python startup overlaps the browser warm-up.
 
 # Run Python monitor
 # Pass arguments if any (for local docker run with args)
@@ -13,4 +20,4 @@ sleep 5
 python3 src/monitor.py "$@"
 
 # Kill Node service when Python finishes
-kill $NODE_PID
+kill "${NODE_PIDS[@]}"
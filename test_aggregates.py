@@ -0,0 +1,42 @@
+from aggregates import AggregateBook
+
+
+def sample(product_id, hour, sold, price=10.0):
+    return {"product_id": product_id, "timestamp": f"2024-05-01T{hour:02d}:00:00", "total_sold": sold,
+            "total_stock": 100 - sold, "price": price}
+
+
+def by_id(snapshot):
+    return {item["product_id"]: item for item in snapshot["products"]}
+
+
+def test_snapshot_copies_only_changed_products(tmp_path):
+    book = AggregateBook(str(tmp_path / "aggregates.json"))
+    for product_id in ("a", "b", "c"):
+        book.update(sample(product_id, 0, 0))
+        book.update(sample(product_id, 1, 2))
+    first = by_id(book.snapshot())
+    assert not book.dirty
+
+    book.update(sample("b", 2, 5))
+    assert book.dirty
+    second = by_id(book.snapshot())
+    assert second["a"] is first["a"] and second["c"] is first["c"]
+    assert second["b"]["cumulative_sold"] == 5
+    # Earlier snapshots are not touched by later updates
+    assert first["b"]["cumulative_sold"] == 2
+    assert first["b"]["hourly"] == [[first["b"]["hourly"][0][0], 2, 20.0]]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "aggregates.json")
+    book = AggregateBook(path)
+    book.update(sample("a", 0, 0))
+    book.update(sample("a", 1, 3))
+    assert book.checkpoint()
+    assert not book.checkpoint()
+
+    loaded = AggregateBook.load(path)
+    assert loaded.report("a") == book.report("a")
+    loaded.update(sample("a", 2, 4))
+    assert by_id(loaded.snapshot())["a"]["cumulative_sold"] == 4
@@ -0,0 +1,33 @@
+from archive import ResponseArchive, iter_index, iter_records
+
+
+def test_index_entries_point_at_readable_frames(tmp_path):
+    directory = str(tmp_path)
+    archive = ResponseArchive(directory, mode="all", segment_bytes=64, compression="gzip")
+    bodies = [f"<html>{i}</html>".encode() * 20 for i in range(10)]
+    for i, body in enumerate(bodies):
+        archive.record(f"https://shop.test/product/{i}", body, "text/html", 200, None, product_id=str(i))
+    archive.close()
+
+    records = list(iter_records(directory))
+    assert [body for _, body in records] == bodies
+    assert [entry["product_id"] for entry, _ in records] == [str(i) for i in range(10)]
+    # Small segments: the frames span several rotated files
+    assert len({entry["segment"] for entry, _ in records}) > 1
+    assert archive.written == 10
+
+
+def test_failures_are_indexed_by_the_id_in_their_url(tmp_path):
+    directory = str(tmp_path)
+    archive = ResponseArchive(directory, mode="all", compression="gzip")
+    archive.record("https://www.tiktok.com/view/product/1729427175685067055?region=US", b"<html></html>",
+                   "text/html", 200, None)
+    archive.record("https://www.tiktok.com/view/product/1729427175685067055", b"{}", "application/json", 200,
+                   {"product_id": "1729427175685067055", "timestamp": "2024-05-01T00:00:00"})
+    archive.record("https://vm.tiktok.com/ZMabc/", b"", "text/html", 200, None)
+    archive.close()
+
+    entries = list(iter_index(directory, product_id="1729427175685067055"))
+    assert [entry["extracted"] for entry in entries] == [False, True]
+    assert [entry["product_id"] for entry in iter_index(directory, failures_only=True)] == [
+        "1729427175685067055", "unknown"]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from catalog import ShopCatalog, parse_listing
+from products import parse_shop_url
+
+TEMPLATE = "https://shop.example/list?seller={shop}&cursor={cursor}&count={count}"
+
+
+class FakeListing:
+    """Serves product ids in pages of `count`; `opaque` switches to string cursors."""
+
+    def __init__(self, ids, opaque=False):
+        self.ids = list(ids)
+        self.opaque = opaque
+        self.requested = []
+
+    async def fetch(self, url):
+        cursor = url.split("cursor=")[1].split("&")[0]
+        self.requested.append(cursor)
+        await asyncio.sleep(0.01)
+        offset = int(cursor.lstrip("c") or 0)
+        page = self.ids[offset:offset + 30]
+        next_cursor = f"c{offset + len(page)}" if self.opaque else offset + len(page)
+        body = {"code": 0, "data": {"products": [{"product_id": p} for p in page],
+                                    "has_more": offset + 30 < len(self.ids), "next_cursor": next_cursor,
+                                    "total": len(self.ids)}}
+        return json.dumps(body).encode(), "application/json"
+
+
+def ids(n, start=0):
+    return [str(1700000000000000000 + i) for i in range(start, start + n)]
+
+
+def test_parse_shop_url():
+    assert parse_shop_url("https://www.tiktok.com/@madebymitchell?lang=en") == "madebymitchell"
+    assert parse_shop_url("https://www.tiktok.com/shop/store/made-by-mitchell/7495000000000000000") == \
+        "7495000000000000000"
+    assert parse_shop_url("https://www.tiktok.com/@shop/product/1729427175685067055") is None
+    assert parse_shop_url("https://www.tiktok.com/@shop/video/123456789") is None
+
+
+def test_parse_listing_nested_and_unrecognized():
+    listing = parse_listing(b'{"data": {"list": {"items": [{"id": 1}, {"id": 2}]}, "hasMore": true, "cursor": 2}}')
+    assert listing.product_ids == ["1", "2"]
+    assert listing.has_more and listing.next_cursor == 2
+    assert parse_listing(b'{"data": {}}') is None
+    assert parse_listing(b"not json") is None
+
+
+def test_walk_streams_pages_and_prefetches():
+    listing = FakeListing(ids(95))
+    catalog = ShopCatalog("shop", TEMPLATE)
+    streamed = []
+    added, removed = asyncio.run(catalog.refresh(listing.fetch, streamed.append))
+    assert added == listing.ids and removed == []
+    assert [len(batch) for batch in streamed] == [30, 30, 30, 5]
+    assert catalog.prefetch_hits == 3
+    assert listing.requested[:4] == ["0", "30", "60", "90"]
+
+
+def test_opaque_cursor_turns_guessing_off():
+    listing = FakeListing(ids(70), opaque=True)
+    catalog = ShopCatalog("shop", TEMPLATE)
+    added, _ = asyncio.run(catalog.refresh(listing.fetch))
+    assert len(added) == 70
+    assert catalog.prefetch_hits == 0
+    assert "c30" in listing.requested and "c60" in listing.requested
+
+
+def test_incremental_refresh():
+    listing = FakeListing(ids(95))
+    catalog = ShopCatalog("shop", TEMPLATE)
+
+    async def run():
+        await catalog.refresh(listing.fetch)
+        pages = catalog.pages_fetched
+        assert await catalog.refresh(listing.fetch) == ([], [])
+        assert catalog.pages_fetched == pages + 1
+        del listing.ids[5:7]
+        listing.ids.extend(ids(3, start=1000))
+        return await catalog.refresh(listing.fetch)
+
+    added, removed = asyncio.run(run())
+    assert added == ids(3, start=1000)
+    assert removed == ids(2, start=5)
+    assert len(catalog.product_ids) == 96
+
+
+def test_failed_page_keeps_known_products():
+    listing = FakeListing(ids(95))
+    catalog = ShopCatalog("shop", TEMPLATE)
+    asyncio.run(catalog.refresh(listing.fetch))
+    listing.ids.append("1")
+
+    async def flaky(url):
+        return None if "cursor=60" in url else await listing.fetch(url)
+
+    added, removed = asyncio.run(catalog.refresh(flaky))
+    assert removed == []
+    assert len(catalog.product_ids) == 95
@@ -0,0 +1,105 @@
+import json
+
+from changes import ChangeDetector, expand_records
+from reports import SampleArrays
+from skus import SkuBook
+from store import SampleStore, to_number
+
+
+def sample(hour, sold, stock, price=9.99, product_id="p1"):
+    return {"product_id": product_id, "timestamp": f"2024-05-01T{hour:02d}:00:00", "total_sold": sold,
+            "total_stock": stock, "price": price, "title": "Fan"}
+
+
+SAMPLES = [sample(0, 100, 50), sample(1, 100, 50), sample(2, 104, 46), sample(3, 104, 46, 8.99),
+           sample(0, 7, 3, product_id="p2"), sample(1, 7, 3, product_id="p2")]
+
+
+def encoded(samples):
+    detector = ChangeDetector(snapshot_hours=24, heartbeat_every=1)
+    return [record for record in map(detector.encode, samples) if record is not None]
+
+
+def write_log(tmp_path, records):
+    path = tmp_path / "monitor_log.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in records) + "not json\n")
+    return str(path)
+
+
+def test_encode_record_types():
+    types = [r["record_type"] for r in encoded(SAMPLES)]
+    assert types == ["snapshot", "heartbeat", "delta", "delta", "snapshot", "heartbeat"]
+
+
+def test_expand_round_trips():
+    expanded = list(expand_records(encoded(SAMPLES)))
+    assert expanded == SAMPLES
+
+
+def test_restore_continues_without_snapshot():
+    detector = ChangeDetector()
+    detector.encode(SAMPLES[0])
+    resumed = ChangeDetector()
+    resumed.restore(json.loads(json.dumps(detector.state())))
+    assert resumed.encode(SAMPLES[1])["record_type"] == "heartbeat"
+    assert resumed.encode(SAMPLES[2])["record_type"] == "delta"
+
+
+def test_report_reader_expands_delta_log(tmp_path):
+    arrays = SampleArrays.from_jsonl(write_log(tmp_path, encoded(SAMPLES)))
+    assert len(arrays) == len(SAMPLES)
+    assert arrays.total_sold.tolist() == [100, 100, 104, 104, 7, 7]
+    assert arrays.total_stock.tolist() == [50, 50, 46, 46, 3, 3]
+
+
+def test_store_import_expands_delta_log(tmp_path):
+    store = SampleStore(str(tmp_path / "monitor.db"))
+    try:
+        assert store.import_jsonl(write_log(tmp_path, encoded(SAMPLES))) == len(SAMPLES)
+        history = store.history("p1", columns=("total_sold", "total_stock", "price"))
+        assert [tuple(row) for row in history] == [(100, 50, 9.99), (100, 50, 9.99), (104, 46, 9.99), (104, 46, 8.99)]
+    finally:
+        store.close()
+
+
+def with_skus(record, *stocks):
+    return dict(record, skus=[{"sku_id": str(i), "stock": stock, "price": 9.99, "sold": None}
+                              for i, stock in enumerate(stocks)])
+
+
+SKU_SAMPLES = [with_skus(sample(0, 100, 50), 30, 20), with_skus(sample(1, 100, 50), 30, 20),
+               with_skus(sample(2, 100, 50), 25, 25)]
+
+
+def test_sku_change_is_a_delta():
+    records = encoded(SKU_SAMPLES)
+    assert [r["record_type"] for r in records] == ["snapshot", "heartbeat", "delta"]
+    assert records[2]["skus"] == SKU_SAMPLES[2]["skus"]
+    assert list(expand_records(records)) == SKU_SAMPLES
+
+
+def test_restore_with_skus():
+    detector = ChangeDetector()
+    detector.encode(SKU_SAMPLES[0])
+    resumed = ChangeDetector()
+    resumed.restore(json.loads(json.dumps(detector.state())))
+    assert resumed.encode(SKU_SAMPLES[1])["record_type"] == "heartbeat"
+    # A state saved before skus was tracked is dropped, not misread
+    stale = ChangeDetector()
+    stale.restore({"p1": [[100, 50, 9.99, None, None, "Fan"], 0, 0]})
+    assert stale.encode(SKU_SAMPLES[1])["record_type"] == "snapshot"
+
+
+def test_sku_report_reads_delta_log(tmp_path):
+    book = SkuBook.from_jsonl(write_log(tmp_path, encoded(SKU_SAMPLES)))
+    report = book.report("p1")
+    assert report["samples"] == 3
+    assert [row["stock"] for row in report["skus"]] == [25, 25]
+    assert [row["restocks"] for row in report["skus"]] == [0, 1]
+
+
+def test_to_number():
+    assert to_number("19.99") == 19.99
+    assert to_number({"min_price": "5"}) == 5.0
+    assert to_number(3) == 3
+    assert to_number("n/a") is None
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import random
+import sys
+
+import pytest
+
+import monitor
+from checkpoint import StateCheckpoint, input_fingerprint, resume_due_times
+from output import LocalDataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "bench"))
+import fakes  # noqa: E402
+
+
+def test_resume_due_times_staggers_overdue_urls():
+    now = 1000.0
+    saved = {"a": 900.0, "b": 1500.0, "c": 950.0}
+    dues = resume_due_times(["a", "b", "c", "new"], saved, now=now, stagger_seconds=300, rng=random.Random(1))
+    assert dues["b"] == 1500.0
+    # Overdue in saved order, then urls without a saved due time, one 100s slot each
+    assert now <= dues["a"] < now + 100 <= dues["c"] < now + 200 <= dues["new"] < now + 300
+
+
+def test_state_round_trip_and_fingerprint(tmp_path):
+    path = str(tmp_path / "state.json")
+    fingerprint = input_fingerprint(["product:1"], 1, 7)
+
+    async def run():
+        await StateCheckpoint(path, fingerprint=fingerprint).save({"end_ts": 1, "schedule": {"u": 2}})
+        same = await StateCheckpoint(path, fingerprint=fingerprint).load()
+        other = await StateCheckpoint(path, fingerprint=input_fingerprint(["product:2"], 1, 7)).load()
+        return same, other
+
+    same, other = asyncio.run(run())
+    assert same["schedule"] == {"u": 2}
+    assert other is None
+    assert input_fingerprint(["b", "a"], 1, 7) == input_fingerprint(["a", "b"], 1.0, 7)
+    assert input_fingerprint(["a"], 1, 7) != input_fingerprint(["a"], 2, 7)
+
+
+@pytest.fixture
+def fleet(tmp_path, monkeypatch):
+    server, base = fakes.start_in_thread()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(monitor, "RESUME_STAGGER_SECONDS", 60)
+    monkeypatch.setattr(monitor, "METRICS_FILE", "")
+    monkeypatch.setattr(monitor.RAW_ARCHIVE, "mode", "off", raising=False)
+    yield base
+    server.shutdown()
+
+
+def run_fleet(base, urls, seconds):
+    async def run():
+        task = asyncio.create_task(monitor.monitor_fleet(
+            urls, duration_days=1, interval_hours=1, host_rate=0, signer_urls=[f"{base}/signature"],
+            dataset=LocalDataset(), parse_workers=0))
+        await asyncio.sleep(seconds)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    with open("monitor_state.json") as f:
+        return json.load(f)
+
+
+def test_fleet_resumes_only_its_own_run(fleet):
+    urls = [f"{fleet}/product/{1700000000000000000 + i}" for i in range(3)]
+    first = run_fleet(fleet, urls, 1.0)
+    assert len(first["schedule"]) == 3
+    resumed = run_fleet(fleet, urls, 0.3)
+    assert resumed["end_ts"] == first["end_ts"]
+    # Polled an hour ago: the saved due times still lie ahead
+    assert resumed["schedule"] == first["schedule"]
+    other = run_fleet(fleet, urls[:2], 0.3)
+    assert other["end_ts"] != first["end_ts"]
+    assert len(other["schedule"]) == 2
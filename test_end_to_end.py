@@ -17,11 +17,13 @@ try:
         print("FAILED: fetch_product_data returned None (This might be expected for dummy URL if scraper logic fails on content)")
         # Since I am using a dummy URL, it will likely fail to extract product info
         # but fetching should succeed (status 200).
-        # Let's check if the raw response was saved.
-        if os.path.exists("debug_response.txt"):
-             print("SUCCESS: debug_response.txt created.")
+        # Let's check if the raw response was archived (failures are archived by default).
+        from monitor import RAW_ARCHIVE
+        RAW_ARCHIVE.close()
+        if os.path.exists(os.path.join(RAW_ARCHIVE.directory, "index.jsonl")):
+             print(f"SUCCESS: raw response archived in {RAW_ARCHIVE.directory}/.")
         else:
-             print("FAILED: debug_response.txt not created.")
+             print(f"FAILED: raw response not archived in {RAW_ARCHIVE.directory}/.")
 except Exception as e:
     print(f"ERROR: {e}")
 
@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+from extractor import find_hydration_json
+from parsing import ParsePool, parse_timed
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "bench", "fixtures")
+PRODUCT_URL = "https://www.tiktok.com/view/product/1729427175685067055"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def test_every_html_fixture_extracts():
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            result, stats = parse_timed(read_fixture(name), "text/html", PRODUCT_URL)
+            assert result is not None, name
+            assert result["title"], name
+
+
+def test_window_assignment_followed_by_another_statement():
+    data, pattern = find_hydration_json(read_fixture("product_window_sigi_trailing.html"))
+    assert pattern == "window['SIGI_STATE']"
+    assert "SIGI_RETRY" not in data
+
+
+def test_window_assignment_inline():
+    body = b"<script>window['SIGI_STATE'] = {\"a\": {\"b\": \"};\"}};window['X']={\"c\": 1};</script>"
+    data, pattern = find_hydration_json(body)
+    assert data == {"a": {"b": "};"}}
+    assert pattern == "window['SIGI_STATE']"
+
+
+def test_no_hydration_json():
+    assert find_hydration_json(b"<html><body>nothing</body></html>") == (None, None)
+
+
+def test_parse_pool_replaces_a_broken_pool():
+    pool = ParsePool(1)
+
+    async def run():
+        await pool.warm_up()
+        for process in list(pool._executor._processes.values()):
+            process.kill()
+            process.join()
+        first = await pool.parse(read_fixture("product_window_sigi.html"), "text/html", PRODUCT_URL)
+        second = await pool.parse(read_fixture("product_window_sigi.html"), "text/html", PRODUCT_URL)
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        pool.close()
+    assert first is not None and second is not None
+    assert pool.restarts == 1
@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import monitor
+from metrics import Metrics, write_snapshot
+
+
+def test_render_and_snapshot():
+    metrics = Metrics()
+    metrics.observe_stage("fetch", 0.2)
+    metrics.inc("responses_total", status=200)
+    metrics.collectors["proxies"] = lambda: [{"name": "direct"}]
+    text = metrics.render()
+    assert 'tiktok_monitor_responses_total{status="200"} 1' in text
+    assert 'tiktok_monitor_stage_seconds_bucket{stage="fetch",le="0.25"} 1' in text
+    snapshot = metrics.snapshot()
+    assert snapshot["stages"]["fetch"]["count"] == 1
+    assert snapshot["proxies"] == [{"name": "direct"}]
+
+
+def test_write_snapshot(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    write_snapshot(path, {"counters": {"a": 1}})
+    with open(path) as f:
+        assert json.load(f) == {"counters": {"a": 1}}
+
+
+def test_collectors_run_on_the_calling_thread(tmp_path, monkeypatch):
+    import threading
+
+    threads = []
+    monkeypatch.setitem(monitor.METRICS.collectors, "probe", lambda: threads.append(threading.get_ident()))
+    path = str(tmp_path / "metrics.json")
+
+    async def run():
+        await monitor.write_metrics(path)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert threads == [loop_thread]
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+
+from output import DatasetWriter, LocalDataset
+
+
+def records(n, start=0):
+    return [{"product_id": str(i)} for i in range(start, start + n)]
+
+
+def test_size_based_flush():
+    async def run():
+        dataset = LocalDataset()
+        writer = DatasetWriter(dataset.push_data, max_batch=10, flush_interval=60)
+        for record in records(25):
+            await writer.put(record)
+        await asyncio.sleep(0.05)
+        # Two full batches went out without waiting for the interval; five are still collecting
+        assert dataset.calls == 2 and len(dataset.items) == 20
+        await writer.close()
+        assert dataset.calls == 3 and dataset.items == records(25)
+
+    asyncio.run(run())
+
+
+def test_time_based_flush():
+    async def run():
+        dataset = LocalDataset()
+        writer = DatasetWriter(dataset.push_data, max_batch=100, flush_interval=0.05)
+        for record in records(3):
+            await writer.put(record)
+        await asyncio.sleep(0.02)
+        assert dataset.calls == 0
+        await asyncio.sleep(0.1)
+        assert dataset.calls == 1 and len(dataset.items) == 3
+        await writer.close()
+        assert dataset.calls == 1
+
+    asyncio.run(run())
+
+
+def test_full_queue_applies_backpressure():
+    async def run():
+        dataset = LocalDataset(latency=0.1)
+        writer = DatasetWriter(dataset.push_data, max_batch=2, flush_interval=60, max_queue=2)
+        started = time.monotonic()
+        for record in records(8):
+            await writer.put(record)
+        # put() had to wait for slow pushes to free queue slots
+        assert time.monotonic() - started >= 0.15
+        assert writer.pending <= 2
+        await writer.close()
+        assert dataset.items == records(8)
+
+    asyncio.run(run())
+
+
+def test_push_retry_and_drop():
+    async def run():
+        calls = []
+
+        async def flaky(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise ConnectionError("dataset unavailable")
+
+        writer = DatasetWriter(flaky, max_batch=5, flush_interval=60, max_retries=1)
+        for record in records(5):
+            await writer.put(record)
+        await writer.close()
+        assert calls == [5, 5] and writer.pushed == 5 and writer.failed == 0
+
+        async def down(batch):
+            raise ConnectionError("dataset unavailable")
+
+        writer = DatasetWriter(down, max_batch=5, flush_interval=60, max_retries=0)
+        for record in records(7):
+            await writer.put(record)
+        await writer.close()
+        assert writer.pushed == 0 and writer.failed == 7
+
+    asyncio.run(run())
+
+
+def test_close_drains_to_local_file(tmp_path):
+    path = tmp_path / "dataset.jsonl"
+
+    async def run():
+        dataset = LocalDataset(str(path))
+        writer = DatasetWriter(dataset.push_data, max_batch=4, flush_interval=60)
+        for record in records(10):
+            await writer.put(record)
+        await writer.close()
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert [json.loads(line) for line in path.read_text().splitlines()] == records(10)
+    assert writer.pushed == 10 and writer.batches == 3 and writer.pending == 0
@@ -0,0 +1,57 @@
+import logging
+
+import pytest
+
+from products import DEFAULT_PRODUCT_URL, ProductKey, dedupe_urls, fill_product_ids, parse_product_url, strip_tracking
+
+PID = "1729427175685067055"
+
+
+@pytest.mark.parametrize("url, expected", [
+    (f"https://www.tiktok.com/@acme.store/product/{PID}", ProductKey(PID, "acme.store")),
+    (f"https://www.tiktok.com/view/product/{PID}?region=US", ProductKey(PID, None)),
+    (f"https://shop.tiktok.com/shop/pdp/wireless-fan/{PID}", ProductKey(PID, None)),
+    (f"https://shop.tiktok.com/view/product/{PID}?seller_id=7495", ProductKey(PID, "7495")),
+    (f"https://www.tiktok.com/shop?product_id={PID}&shop_id=42", ProductKey(PID, "42")),
+    (f"https://www.tiktok.com/shop?productId={PID}", ProductKey(PID, None)),
+    (f"  {PID} ", ProductKey(PID, None)),
+    ("https://vm.tiktok.com/ZMabc123/", None),
+    ("https://www.tiktok.com/@acme.store", None),
+])
+def test_parse_product_url(url, expected):
+    assert parse_product_url(url) == expected
+
+
+def test_strip_tracking():
+    url = (f"https://www.tiktok.com/view/product/{PID}?region=US&utm_source=ig&share_link_id=9"
+           f"&_r=1&u_code=x&locale=en-US#reviews")
+    assert strip_tracking(url) == f"https://www.tiktok.com/view/product/{PID}?region=US&locale=en-US"
+    assert strip_tracking("https://vm.tiktok.com/ZMabc/?_t=8k") == "https://vm.tiktok.com/ZMabc/"
+
+
+def test_dedupe_merges_spellings_and_keeps_the_first(caplog):
+    urls = [
+        f"https://www.tiktok.com/@acme.store/product/{PID}?utm_source=ig",
+        f"https://www.tiktok.com/view/product/{PID}",
+        PID,
+        "1729427175685067999",
+        "https://vm.tiktok.com/ZMabc/?_t=1",
+        "https://vm.tiktok.com/ZMabc/?_t=2",
+    ]
+    with caplog.at_level(logging.INFO):
+        targets = dedupe_urls(urls)
+    assert targets == {
+        f"product:{PID}": f"https://www.tiktok.com/@acme.store/product/{PID}",
+        "product:1729427175685067999": DEFAULT_PRODUCT_URL.format(product_id="1729427175685067999"),
+        "https://vm.tiktok.com/ZMabc/": "https://vm.tiktok.com/ZMabc/",
+    }
+    assert "Merged 3 duplicate inputs; 3 distinct products." in caplog.text
+
+
+def test_fill_product_ids():
+    url = f"https://www.tiktok.com/@acme.store/product/{PID}"
+    assert fill_product_ids({"product_id": "unknown"}, url) == {"product_id": PID, "shop": "acme.store"}
+    # Extracted values win over the URL
+    assert fill_product_ids({"product_id": "1", "shop": "other"}, url) == {"product_id": "1", "shop": "other"}
+    assert fill_product_ids({"product_id": None}, "https://vm.tiktok.com/ZMabc/") == {"product_id": None}
+    assert fill_product_ids(None, url) is None
@@ -0,0 +1,39 @@
+import os
+
+from archive import ResponseArchive
+from parsing import parse_timed
+from replay import replay
+from store import SampleStore
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "bench", "fixtures")
+URL = "https://www.tiktok.com/view/product/1729427175685067055"
+
+
+def test_replay_replaces_stored_rows(tmp_path):
+    with open(os.path.join(FIXTURES_DIR, "product_window_sigi.html"), "rb") as f:
+        body = f.read()
+    result, _ = parse_timed(body, "text/html", URL)
+    assert result["total_sold"]
+    directory = str(tmp_path / "archive")
+    store = SampleStore(str(tmp_path / "monitor.db"))
+    try:
+        # The original poll: stored, and its response archived alongside a failed page
+        store.add(dict(result, total_sold=0))
+        store.flush()
+        archive = ResponseArchive(directory, mode="all", compression="gzip")
+        archive.record(URL, body, "text/html", 200, result)
+        archive.record(URL + "?page=2", b"<html>captcha</html>", "text/html", 200, None)
+        archive.close()
+
+        report = replay(directory, store, workers=0)
+        rows = store.history(result["product_id"])
+    finally:
+        store.close()
+
+    assert len(rows) == 1
+    assert rows[0]["replayed"] is True
+    assert rows[0]["timestamp"] == result["timestamp"]
+    assert rows[0]["total_sold"] == result["total_sold"]
+    assert report.records == 2 and report.extracted == 1 and report.lost == 0 and report.fixed == 0
+    assert report.paths == {"window['SIGI_STATE']": 1, "none": 1}
+    assert report.item_paths == {"ItemModule": 1, "none": 1}
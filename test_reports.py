@@ -0,0 +1,55 @@
+import csv
+import math
+
+from reports import SampleArrays, aggregate, compute_intervals, write_csv
+
+H = 3600.0
+# p1: hourly samples with a counter reset and a restock; p2: a 5h gap
+ROWS = [
+    ("p1", 0 * H, 100, 50, 10.0),
+    ("p1", 1 * H, 104, 46, 10.0),
+    ("p1", 2 * H, 110, 60, 12.0),
+    ("p1", 3 * H, 3, 57, 12.0),
+    ("p2", 0 * H, 10, 5, None),
+    ("p2", 5 * H, 20, 0, 2.0),
+]
+
+
+def nan_list(values):
+    return [None if math.isnan(v) else v for v in values.tolist()]
+
+
+def test_compute_intervals():
+    intervals = compute_intervals(SampleArrays.from_rows(ROWS))
+    assert nan_list(intervals["sold_delta"]) == [None, 4, 6, 3, None, 10]
+    assert intervals["counter_reset"].tolist() == [False, False, False, True, False, False]
+    assert nan_list(intervals["stock_depletion"]) == [None, 4, 0, 3, None, 5]
+    assert nan_list(intervals["restock"]) == [None, 0, 14, 0, None, 0]
+    # Mean of both prices, or whichever side has one
+    assert nan_list(intervals["revenue"]) == [None, 40.0, 66.0, 36.0, None, 20.0]
+    assert intervals["gap"].tolist() == [False, False, False, False, False, True]
+    assert nan_list(intervals["sales_per_hour"]) == [None, 4, 6, 3, None, 2]
+    assert nan_list(intervals["rolling_sales_per_hour"]) == [None, 4, 5, 13 / 3, None, 2]
+
+
+def test_aggregate_daily_and_hourly(tmp_path):
+    intervals = compute_intervals(SampleArrays.from_rows(ROWS))
+    daily = aggregate(intervals, "day")
+    assert daily["product_id"].tolist() == ["p1", "p2"]
+    assert daily["sold"].tolist() == [13, 10]
+    assert daily["samples"].tolist() == [3, 1]
+    assert daily["last_stock"].tolist() == [57, 0]
+
+    hourly = aggregate(intervals, "hour")
+    assert len(hourly["product_id"]) == 4
+    path = str(tmp_path / "hourly.csv")
+    write_csv(hourly, path)
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["bucket_start"] == "1970-01-01T01:00:00+00:00"
+    assert float(rows[0]["sold"]) == 4
+
+
+def test_empty_history():
+    intervals = compute_intervals(SampleArrays.from_rows([]))
+    assert len(aggregate(intervals)["product_id"]) == 0
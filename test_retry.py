@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import pytest
+
+import monitor
+from retry import CircuitBreaker, HedgePolicy, RetryPolicy, TransientError
+from signer import SignerClient, SignerPool
+from test_signer import FakeSessions
+
+
+def test_retry_until_success_with_bounded_backoff():
+    policy = RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.02)
+    calls = []
+
+    async def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise TransientError("503")
+        return "ok"
+
+    assert asyncio.run(policy.run(flaky, "p1")) == "ok"
+    assert len(calls) == 3 and policy.retries == 2 and policy.exhausted == 0
+    assert all(0 <= policy.delay(n) <= 0.02 for n in range(10))
+
+
+def test_retry_gives_up_and_skips_final_errors():
+    policy = RetryPolicy(attempts=2, base_delay=0)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise TransientError("timeout")
+
+    with pytest.raises(TransientError):
+        asyncio.run(policy.run(failing))
+    assert len(calls) == 2 and policy.exhausted == 1
+
+    def not_found():
+        calls.append(1)
+        raise ValueError("404")
+
+    with pytest.raises(ValueError):
+        policy.run_sync(not_found)
+    assert len(calls) == 3
+
+
+def test_retry_timeout_bounds_each_attempt():
+    policy = RetryPolicy(attempts=2, base_delay=0, timeout=0.05)
+
+    async def hangs():
+        await asyncio.sleep(1)
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.run(hangs))
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedge_duplicates_slow_call_and_cancels_the_loser():
+    hedge = HedgePolicy(percentile=0.5, min_samples=3)
+    for latency in (0.01, 0.01, 0.01):
+        hedge.observe(latency)
+    started, cancelled = [], []
+
+    async def call():
+        n = len(started)
+        started.append(n)
+        try:
+            await asyncio.sleep(1.0 if n == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return n
+
+    async def run():
+        result = await hedge.run(call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 1
+    assert cancelled == [0]
+    assert hedge.hedged == 1 and hedge.hedge_wins == 1
+
+
+def test_no_hedge_without_history():
+    hedge = HedgePolicy(min_samples=3)
+
+    async def call():
+        await asyncio.sleep(0.02)
+        return "only"
+
+    assert asyncio.run(hedge.run(call)) == "only"
+    assert hedge.hedged == 0
+
+
+def test_breaker_open_half_open_closed():
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05, max_reset_seconds=0.1)
+        assert await breaker.acquire() is None
+        breaker.record(False)
+        assert breaker.state == "closed"
+        breaker.record(False)
+        assert breaker.state == "open" and breaker.opened == 1
+
+        trial = await asyncio.wait_for(breaker.acquire(), 1)
+        assert trial is not None and breaker.state == "half-open"
+        # A failed trial re-opens with the wait doubled
+        breaker.record(False)
+        assert breaker.state == "open" and breaker.reset_seconds == 0.1
+
+        trial = await asyncio.wait_for(breaker.acquire(), 1)
+        waiter = asyncio.create_task(breaker.acquire())
+        await asyncio.sleep(0.02)
+        assert not waiter.done()
+        breaker.record(True)
+        assert await asyncio.wait_for(waiter, 1) is None
+        assert breaker.state == "closed" and breaker.reset_seconds == 0.05
+
+    asyncio.run(run())
+
+
+def test_cancelled_trial_frees_the_slot():
+    class HangingSigner:
+        async def sign(self, url):
+            await asyncio.sleep(10)
+
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.01)
+        breaker.record(False)
+        await asyncio.sleep(0.02)
+        # A listing prefetch takes the trial and is then cancelled
+        task = asyncio.create_task(monitor.fetch_signed_async("https://shop.test/p/1", None, HangingSigner(),
+                                                              breaker=breaker))
+        await asyncio.sleep(0.02)
+        assert breaker.state == "half-open"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert await asyncio.wait_for(breaker.acquire(), 1) is not None
+
+    asyncio.run(run())
+
+
+def test_failed_batch_counts_once():
+    class FailingSigner:
+        async def post(self, url, json, timeout):
+            raise ConnectionError("signer down")
+
+    async def run():
+        sessions = FakeSessions()
+        sessions.session = FailingSigner()
+        breaker = CircuitBreaker(failure_threshold=5)
+        client = SignerClient(SignerPool(["http://signer/signature"], sessions), sessions,
+                              batch_window=0.01, breaker=breaker)
+        results = await asyncio.gather(*(client.sign(f"https://shop.test/p/{i}") for i in range(30)))
+        assert results == [None] * 30
+        assert breaker.failures == 1 and breaker.state == "closed"
+
+    asyncio.run(run())
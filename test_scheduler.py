@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+from scheduler import AdaptiveIntervalPolicy, FleetScheduler, HostRateLimiter
+
+
+def run_for(scheduler, poll, seconds):
+    asyncio.run(scheduler.run(poll, time.time() + seconds))
+
+
+def test_polls_in_due_order_and_reschedules():
+    scheduler = FleetScheduler(interval_hours=0.3 / 3600, max_concurrency=1, host_rate=0)
+    now = time.time()
+    scheduler.add("b", now + 0.05)
+    scheduler.add("a", now)
+    polled = []
+
+    async def poll(url):
+        polled.append(url)
+
+    run_for(scheduler, poll, 0.5)
+    assert polled[:4] == ["a", "b", "a", "b"]
+    assert set(scheduler.due_times()) == {"a", "b"}
+
+
+def test_add_replaces_previous_due_time():
+    scheduler = FleetScheduler(host_rate=0)
+    scheduler.add("a", time.time() + 3000)
+    scheduler.add("a", time.time() + 10)
+    assert len(scheduler) == 1
+    assert scheduler.due_times()["a"] < time.time() + 11
+
+
+def test_remove_while_waiting_for_a_slot_does_not_poll_early():
+    scheduler = FleetScheduler(interval_hours=1, max_concurrency=1, host_rate=0)
+    now = time.time()
+    scheduler.add("busy", now)
+    scheduler.add("due", now + 0.01)
+    scheduler.add("later", now + 3000)
+    polled = []
+
+    async def poll(url):
+        polled.append(url)
+        if url == "busy":
+            # "due" is waiting for the only slot; the catalog refresh delists it
+            await asyncio.sleep(0.1)
+            scheduler.remove("due")
+            await asyncio.sleep(0.1)
+
+    run_for(scheduler, poll, 0.5)
+    assert polled == ["busy"]
+    assert set(scheduler.due_times()) == {"busy", "later"}
+
+
+def test_removed_in_flight_url_is_not_rescheduled():
+    scheduler = FleetScheduler(interval_hours=1, host_rate=0)
+    scheduler.add("a")
+
+    async def poll(url):
+        scheduler.remove(url)
+
+    run_for(scheduler, poll, 0.2)
+    assert scheduler.due_times() == {}
+    assert len(scheduler) == 0
+
+
+def test_adaptive_policy_state_round_trip():
+    policy = AdaptiveIntervalPolicy(base_hours=1, min_hours=0.25, max_hours=6)
+    policy.observe("a", {"total_sold": 1, "total_stock": 5})
+    policy.observe("a", {"total_sold": 2, "total_stock": 4})
+    restored = AdaptiveIntervalPolicy(base_hours=1, min_hours=0.25, max_hours=6)
+    restored.restore(policy.state(), keys={"a"})
+    assert restored.interval("a") == policy.interval("a") == 1800
+    assert restored.demand_per_hour == policy.demand_per_hour
+
+
+def test_rate_limiter_set_rate():
+    limiter = HostRateLimiter(2.0)
+
+    async def take(n):
+        started = time.monotonic()
+        for _ in range(n):
+            await limiter.acquire("host")
+        return time.monotonic() - started
+
+    # The burst of 2 is spent, then 2/s; at 50/s the next 10 take about 0.2s instead of 5s
+    asyncio.run(take(2))
+    limiter.set_rate(50.0)
+    assert limiter.burst == 50.0
+    assert asyncio.run(take(10)) < 1.0
+
+
+def test_fleet_demand_counts_unseen_products_and_the_budget():
+    policy = AdaptiveIntervalPolicy(base_hours=1, min_hours=0.25, max_hours=6)
+    assert policy.fleet_demand(10) == 10
+    for sold in (1, 2, 3):
+        policy.observe("fast", {"total_sold": sold, "total_stock": 5})
+    # One product down at the 15 minute floor, nine still hourly
+    assert policy.fleet_demand(10) == 4 + 9
+    policy.budget = 8.0
+    assert policy.fleet_demand(10) == 8.0
+
+
+def test_len_counts_urls_being_polled():
+    scheduler = FleetScheduler(interval_hours=1, max_concurrency=2, host_rate=0)
+    scheduler.add("a")
+    scheduler.add("b", time.time() + 3000)
+    sizes = []
+
+    async def poll(url):
+        sizes.append(len(scheduler))
+
+    run_for(scheduler, poll, 0.1)
+    assert sizes == [2]
+
+
+def observe_all(policy, key, samples):
+    for sold, stock in samples:
+        policy.observe(key, {"total_sold": sold, "total_stock": stock})
+
+
+def test_adaptive_interval_shrinks_on_change_and_grows_when_idle():
+    policy = AdaptiveIntervalPolicy(base_hours=1, min_hours=0.25, max_hours=6)
+    observe_all(policy, "moving", [(1, 9), (2, 8)])
+    observe_all(policy, "idle", [(1, 9), (1, 9)])
+    assert policy.interval("moving") == 1800
+    assert policy.interval("idle") == 5400
+    # A stock-only change counts as movement too
+    observe_all(policy, "idle", [(1, 7)])
+    assert policy.interval("idle") == 2700
+    # Failed fetches leave the interval alone
+    policy.observe("moving", None)
+    assert policy.interval("moving") == 1800
+    assert policy.demand_per_hour == 3600 / 1800 + 3600 / 2700
+
+
+def test_adaptive_interval_bounds():
+    policy = AdaptiveIntervalPolicy(base_hours=1, min_hours=0.25, max_hours=6)
+    observe_all(policy, "fast", [(n, 0) for n in range(10)])
+    observe_all(policy, "slow", [(0, 0)] * 20)
+    assert policy.interval("fast") == 900
+    assert policy.interval("slow") == 6 * 3600
+    assert policy.interval("new") == 3600
+
+
+def test_adaptive_budget_stretches_every_interval():
+    policy = AdaptiveIntervalPolicy(base_hours=1, min_hours=0.25, max_hours=6, budget_per_hour=5)
+    for key in "abcd":
+        observe_all(policy, key, [(n, 0) for n in range(4)])
+    # Four products at 15 minutes want 16 requests/hour against a budget of 5
+    assert policy.demand_per_hour == 16
+    assert policy.budget_factor() == 16 / 5
+    assert policy.interval("a") == 900 * 16 / 5
+    policy.forget("a")
+    policy.forget("b")
+    assert policy.budget_factor() == 8 / 5
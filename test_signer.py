@@ -0,0 +1,175 @@
+import asyncio
+
+from monitor import build_signed_request
+from signer import SignerClient, SignerPool
+
+URL = "https://www.tiktok.com/view/product/1729427175685067055?region=US&locale=en-US&blank="
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return {"status": "ok", "data": self._data}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSigner:
+    def __init__(self):
+        self.signed = []
+
+    async def post(self, url, json, timeout):
+        self.signed.extend(json["urls"])
+        return FakeResponse({"signatures": [{"X-Bogus": f"bogus{i}"} for i, _ in enumerate(json["urls"])],
+                             "cookies": "ttwid=1", "navigator": {"user_agent": "UA"}})
+
+
+class FakeSessions:
+    def __init__(self):
+        self.session = FakeSigner()
+
+    def signer(self):
+        return self.session
+
+
+def make_client():
+    sessions = FakeSessions()
+    client = SignerClient(SignerPool(["http://signer/signature"], sessions), sessions, batch_window=0.01)
+    return client, sessions.session
+
+
+def test_signs_and_fetches_the_exact_url():
+    async def run():
+        client, fake = make_client()
+        signed = await client.sign(URL)
+        assert fake.signed == [URL]
+        signed_url, headers = build_signed_request(URL, signed)
+        assert signed_url == URL + "&X-Bogus=bogus0"
+        assert headers["User-Agent"] == "UA"
+
+    asyncio.run(run())
+
+
+def test_other_spelling_reuses_the_signed_url():
+    async def run():
+        client, fake = make_client()
+        first = await client.sign(URL)
+        reordered = "https://WWW.tiktok.com/view/product/1729427175685067055?locale=en-US&blank=&region=US"
+        second = await client.sign(reordered)
+        assert second is first
+        assert fake.signed == [URL]
+        assert build_signed_request(reordered, second)[0].startswith(URL + "&")
+
+    asyncio.run(run())
+
+
+def test_concurrent_signs_share_one_batch():
+    async def run():
+        client, fake = make_client()
+        urls = [f"https://www.tiktok.com/view/product/{i}?b=2&a=1" for i in range(5)]
+        results = await asyncio.gather(*(client.sign(url) for url in urls + urls[:2]))
+        assert fake.signed == urls
+        assert [r["url"] for r in results] == urls + urls[:2]
+        assert not client._flush_tasks
+
+    asyncio.run(run())
+
+
+class HealthResponse(FakeResponse):
+    def __init__(self, ready):
+        super().__init__(None)
+        self.ready = ready
+        self.status_code = 200 if ready else 503
+
+    def json(self):
+        return {"status": "ok" if self.ready else "starting", "signer": self.ready}
+
+
+class FleetSigner(FakeSigner):
+    """Several signer instances behind one fake session: `down` fail requests, `ready` answer /health."""
+
+    def __init__(self, urls):
+        super().__init__()
+        self.down = set()
+        self.ready = set(urls)
+        self.calls = []
+
+    async def post(self, url, json, timeout):
+        base = url.rsplit("/batch", 1)[0]
+        self.calls.append(base)
+        if base in self.down:
+            raise ConnectionError(f"{base} unreachable")
+        return await super().post(url, json, timeout)
+
+    async def get(self, url, timeout):
+        return HealthResponse(url.rsplit("/health", 1)[0] + "/signature" in self.ready)
+
+
+SIGNERS = ["http://a/signature", "http://b/signature"]
+
+
+def make_fleet(**kwargs):
+    sessions = FakeSessions()
+    sessions.session = FleetSigner(SIGNERS)
+    pool = SignerPool(SIGNERS, sessions, **kwargs)
+    return pool, sessions
+
+
+def test_pool_picks_the_least_outstanding_endpoint():
+    pool, _ = make_fleet()
+    a = pool.acquire()
+    b = pool.acquire()
+    assert (a.url, b.url) == tuple(SIGNERS)
+    assert pool.acquire() is a
+    pool.release(a)
+    pool.release(a)
+    assert pool.acquire() is a
+    assert pool.acquire(exclude=[a]) is b
+
+
+def test_pool_ejects_after_max_failures():
+    pool, _ = make_fleet(max_failures=2, eject_seconds=60)
+    a = pool.endpoints[0]
+    for _ in range(2):
+        assert pool.acquire(exclude=[pool.endpoints[1]]) is a
+        pool.release(a, ok=False)
+    assert pool.stats()[0]["ejected"]
+    assert pool.acquire() is pool.endpoints[1]
+    # With every endpoint excluded or ejected, an ejected one still serves
+    assert pool.acquire(exclude=[pool.endpoints[1]]) is a
+
+
+def test_health_probe_ejects_and_recovers():
+    async def run():
+        pool, sessions = make_fleet()
+        sessions.session.ready.discard(SIGNERS[0])
+        assert await pool.probe_all() == 1
+        assert not pool.endpoints[0].healthy
+        assert pool.acquire() is pool.endpoints[1]
+        sessions.session.ready.add(SIGNERS[0])
+        assert await pool.wait_ready(timeout=1) == 2
+        assert pool.endpoints[0].healthy and pool.endpoints[0].failures == 0
+
+    asyncio.run(run())
+
+
+def test_chunk_fails_over_to_another_endpoint():
+    async def run():
+        pool, sessions = make_fleet(max_failures=1)
+        fake = sessions.session
+        fake.down.add(SIGNERS[0])
+        client = SignerClient(pool, sessions, batch_window=0.01)
+        signed = await client.sign(URL)
+        assert signed["url"] == URL
+        assert fake.calls == SIGNERS
+        assert pool.stats()[0]["ejected"] and pool.stats()[1]["failures"] == 0
+        # Every endpoint down: the chunk gives up with no signatures
+        fake.down.add(SIGNERS[1])
+        assert await client.sign(URL + "&other=1") is None
+
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+import asyncio
+
+import monitor
+from changes import ChangeDetector
+from store import SampleStore
+
+
+def sample(hour, sold, stock=50):
+    return {"product_id": "p1", "timestamp": f"2024-05-01T{hour:02d}:00:00", "url": "https://shop.test/product/1",
+            "total_sold": sold, "total_stock": stock, "price": 9.99, "title": "Fan",
+            "skus": [{"sku_id": "1", "stock": stock, "price": 9.99, "sold": None}],
+            "raw_response_snippet": "{'data': ...}"}
+
+
+SAMPLES = [sample(0, 100), sample(1, 100), sample(2, 100), sample(3, 104, 46), sample(4, 104, 46)]
+
+
+def stored_blobs(store):
+    return [row[0] is not None for row in store._conn.execute("SELECT data FROM samples ORDER BY ts")]
+
+
+def test_unchanged_samples_skip_the_json_copy(tmp_path):
+    store = SampleStore(str(tmp_path / "monitor.db"))
+    try:
+        changes = ChangeDetector()
+
+        async def run():
+            for s in SAMPLES:
+                await monitor.record_sample(s, store, changes=changes)
+
+        asyncio.run(run())
+        store.flush()
+        assert stored_blobs(store) == [True, False, False, True, False]
+        expected = [{k: v for k, v in s.items() if k != "raw_response_snippet"} for s in SAMPLES]
+        assert store.history("p1") == expected
+        # A range starting on unchanged rows picks up the last full row before it
+        assert store.history("p1", since="2024-05-01T01:00:00") == expected[1:]
+        assert len(store.range()) == 5
+    finally:
+        store.close()
+
+
+def test_full_mode_stores_every_blob(tmp_path):
+    store = SampleStore(str(tmp_path / "monitor.db"))
+    try:
+        async def run():
+            for s in SAMPLES:
+                await monitor.record_sample(s, store)
+
+        asyncio.run(run())
+        store.flush()
+        assert stored_blobs(store) == [True] * 5
+        assert "raw_response_snippet" not in store.history("p1")[0]
+    finally:
+        store.close()